@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Compare fast_csv.load_csv's compact integer mode with the float64 default,
+and check that readings_09.compute gives identical results from both.
+Usage: python bench_compact.py [n_patients]
+"""
+
+from pathlib import Path
+import io
+import sys
+
+import numpy
+
+CODE_DIR = Path(__file__).resolve().parent.parent / 'episodes' / 'files' / 'code'
+sys.path.insert(0, str(CODE_DIR))
+import fast_csv
+import gen_inflammation
+import readings_09
+import timer
+
+
+def main():
+    n_patients = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    text = io.StringIO()
+    gen_inflammation.generate(text, numpy.random.default_rng(0), n_patients)
+    text = text.getvalue().encode()
+
+    wide = fast_csv.parse_csv(text)
+    narrow = fast_csv.parse_csv(text, compact=True)
+    assert narrow.dtype == numpy.uint8 and numpy.array_equal(wide, narrow)
+    actions = list(readings_09.ACTIONS)
+    assert numpy.array_equal(readings_09.compute(wide, actions),
+                             readings_09.compute(narrow, actions))
+
+    print('%d patients: float64 %.1f MB, %s %.1f MB'
+          % (n_patients, wide.nbytes / 1e6, narrow.dtype, narrow.nbytes / 1e6))
+    for label, func in [('parse', lambda compact: fast_csv.parse_csv(text, compact=compact)),
+                        ('compute', lambda compact: readings_09.compute(
+                            narrow if compact else wide, actions))]:
+        slow = timer.best_of(3, lambda: func(False))
+        fast = timer.best_of(3, lambda: func(True))
+        print('%-8s float64 %.3fs, compact %.3fs' % (label, slow, fast))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Compare fast_csv.load_csv with numpy.loadtxt on the inflammation data.
+Usage: python bench_fast_csv.py [scale]
+Each inflammation-NN.csv file is repeated `scale` times (default 1000).
+"""
+
+from pathlib import Path
+import io
+import sys
+
+import numpy
+
+CODE_DIR = Path(__file__).resolve().parent.parent / 'episodes' / 'files' / 'code'
+DATA_DIR = Path(__file__).resolve().parent.parent / 'episodes' / 'data'
+sys.path.insert(0, str(CODE_DIR))
+import fast_csv
+import timer
+
+
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    print('%-22s %10s %10s %8s' % ('file', 'loadtxt', 'load_csv', 'speedup'))
+    for path in sorted(DATA_DIR.glob('inflammation-*.csv')):
+        text = path.read_bytes() * scale
+        expected = numpy.loadtxt(io.BytesIO(text), delimiter=',')
+        assert (fast_csv.load_csv(io.BytesIO(text)) == expected).all()
+        slow = timer.best_of(3, lambda: numpy.loadtxt(io.BytesIO(text), delimiter=','))
+        fast = timer.best_of(3, lambda: fast_csv.load_csv(io.BytesIO(text)))
+        print('%-22s %9.3fs %9.3fs %7.1fx' % (path.name, slow, fast, slow / fast))
+
+
+if __name__ == '__main__':
+    main()
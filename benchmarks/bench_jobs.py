@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Time readings_09.py over many files with 1, 2, 4 and 8 worker processes.
+Usage: python bench_jobs.py [n_files]
+The inflammation data files are copied into a temporary directory until
+there are n_files of them (default 2000).
+"""
+
+from pathlib import Path
+import itertools
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPT = ROOT / 'episodes' / 'files' / 'code' / 'readings_09.py'
+DATA_DIR = ROOT / 'episodes' / 'data'
+
+
+def main():
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    sources = sorted(DATA_DIR.glob('inflammation-*.csv'))
+    print('%d files, %d CPUs' % (n_files, os.cpu_count()))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filenames = []
+        for i, source in zip(range(n_files), itertools.cycle(sources)):
+            filename = os.path.join(tmpdir, 'inflammation-%05d.csv' % i)
+            shutil.copyfile(source, filename)
+            filenames.append(filename)
+
+        baseline = None
+        for jobs in [1, 2, 4, 8]:
+            command = [sys.executable, str(SCRIPT), '--jobs', str(jobs),
+                       '--min', '--mean', '--max'] + filenames
+            start = time.perf_counter()
+            subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print('jobs=%d: %.2fs (%.1fx)' % (jobs, elapsed, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Compare line counting with readlines() against line_count.py's chunked
+and memory-mapped counters.
+Usage: python bench_line_count.py [megabytes]
+A temporary file of about that many megabytes (default 2048) is built by
+repeating inflammation-01.csv. Note that the readlines() baseline holds
+the whole file in memory.
+"""
+
+from pathlib import Path
+import os
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'episodes' / 'files' / 'code'))
+import line_count
+
+
+def count_readlines(filename):
+    with open(filename, 'r') as f:
+        return len(f.readlines())
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 2048
+    block = (ROOT / 'episodes' / 'data' / 'inflammation-01.csv').read_bytes()
+    block = block * ((1 << 20) // len(block) + 1)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, 'big.csv')
+        with open(filename, 'wb') as f:
+            for _ in range(megabytes):
+                f.write(block)
+
+        counters = [('readlines', count_readlines),
+                    ('chunked', line_count.count_file),
+                    ('mmap', lambda name: line_count.count_file(name, use_mmap=True))]
+        print('%.0f MB file' % (os.path.getsize(filename) / 1e6))
+        for label, counter in counters:
+            start = time.perf_counter()
+            nlines = counter(filename)
+            print('%-10s %10d lines %8.3fs' % (label, nlines, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Compare optimize_svg.py's compiled cleanup with the old line-by-line loop
+on a large SVG written by Matplotlib.
+Usage: python bench_manual_cleanup.py [n_subplots]
+"""
+
+from pathlib import Path
+import io
+import re
+import sys
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot
+import numpy
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'episodes' / 'fig'))
+import optimize_svg
+import timer
+
+
+def line_by_line(text):
+    """the cleanup loop optimize_svg.py used before CleanupRules"""
+    text_to_remove = ['font-family="DejaVu Sans"', 'stroke-width=".8"']
+    patterns_to_remove = [r'\s*transform="rotate\(-?0 .+?\)"']
+    out = io.StringIO()
+    for line in io.StringIO(text):
+        if line.startswith("<!DOCTYPE"): continue
+        for txt in text_to_remove: line = line.replace(txt, "")
+        for pat in patterns_to_remove: line = re.sub(pat, "", line)
+        if line == '\n': continue
+        out.write(line)
+    return out.getvalue()
+
+
+def main():
+    n_subplots = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    matplotlib.pyplot.rcParams['svg.fonttype'] = 'none'
+    data = numpy.random.default_rng(0).integers(0, 20, (60, 40))
+    fig = matplotlib.pyplot.figure(figsize=(40.0, 40.0))
+    side = int(numpy.ceil(numpy.sqrt(n_subplots)))
+    for i in range(n_subplots):
+        axes = fig.add_subplot(side, side, i + 1)
+        axes.plot(data[i % 60], drawstyle='steps-mid')
+        axes.set_ylabel('day %d' % i)
+    svg = io.StringIO()
+    fig.savefig(svg, format='svg')
+    text = svg.getvalue()
+
+    slow = timer.best_of(3, lambda: line_by_line(text))
+    fast = timer.best_of(3, lambda: optimize_svg.CLEANUP_RULES.clean(text))
+    print('%.1f MB SVG: line by line %.3fs, compiled %.3fs, %.1fx faster'
+          % (len(text) / 1e6, slow, fast, slow / fast))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Time optimize_svg.py on a directory of SVGs with different --jobs values.
+Usage: python bench_optimize_svg.py [n_files]
+If svgcleaner/svgo are not installed, stand-in executables that copy
+their input after a short delay (imitating process start-up and work)
+are put on PATH, so the benchmark measures scheduling rather than the
+tools themselves.
+"""
+
+from pathlib import Path
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPT = ROOT / 'episodes' / 'fig' / 'optimize_svg.py'
+SAMPLE = ROOT / 'episodes' / 'fig' / 'inflammation-01-group-plot.svg'
+
+STUB_SVGCLEANER = '''#!/usr/bin/env python3
+import shutil, sys, time
+if sys.argv[1] == '--version':
+    print('svgcleaner 0.0.0-stub')
+    sys.exit()
+time.sleep(0.05)
+shutil.copyfile(sys.argv[-2], sys.argv[-1])
+'''
+
+STUB_SVGO = '''#!/usr/bin/env python3
+import shutil, sys, time
+if sys.argv[1] == '--version':
+    print('0.0.0-stub')
+    sys.exit()
+args = sys.argv[1:]
+inputs = args[args.index('-i') + 1:args.index('-o')]
+outputs = args[args.index('-o') + 1:]
+time.sleep(0.05 + 0.005 * len(inputs))
+for source, target in zip(inputs, outputs):
+    shutil.copyfile(source, target)
+'''
+
+
+def main():
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = dict(os.environ)
+        for name, stub in [('svgcleaner', STUB_SVGCLEANER), ('svgo', STUB_SVGO)]:
+            if shutil.which(name) is None:
+                path = os.path.join(tmpdir, name)
+                with open(path, 'w') as f:
+                    f.write(stub)
+                os.chmod(path, 0o755)
+        env['PATH'] = tmpdir + os.pathsep + env['PATH']
+
+        files = []
+        for i in range(n_files):
+            filename = os.path.join(tmpdir, 'figure-%04d.svg' % i)
+            shutil.copyfile(SAMPLE, filename)
+            files.append(filename)
+
+        for optimizer in ['svgcleaner', 'svgo']:
+            for jobs in [1, 4, 16]:
+                command = [sys.executable, str(SCRIPT), '-o', optimizer,
+                           '--jobs', str(jobs)] + files
+                start = time.perf_counter()
+                subprocess.run(command, env=env, stdout=subprocess.DEVNULL, check=True)
+                print('%-10s jobs=%-2d %6.2fs' % (optimizer, jobs, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Compare the array rectangle functions with a loop over the per-tuple ones.
+Usage: python bench_rectangle.py [n_rectangles]
+"""
+
+from pathlib import Path
+import sys
+
+import numpy
+
+CODE_DIR = Path(__file__).resolve().parent.parent / 'episodes' / 'files' / 'code'
+sys.path.insert(0, str(CODE_DIR))
+import rectangle
+import timer
+
+
+def random_rectangles(n_rects, seed=0):
+    """n_rects valid (x0, y0, x1, y1) rows"""
+    rng = numpy.random.default_rng(seed)
+    corners = rng.uniform(-100.0, 100.0, (n_rects, 2))
+    sizes = rng.uniform(0.1, 50.0, (n_rects, 2))
+    return numpy.hstack([corners, corners + sizes])
+
+
+def main():
+    n_rects = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rects = random_rectangles(n_rects)
+    tuples = [tuple(rect) for rect in rects.tolist()]
+
+    assert numpy.array_equal(rectangle.rectangle_areas(rects),
+                             [rectangle.rectangle_area(rect) for rect in tuples])
+    assert numpy.array_equal(rectangle.normalize_rectangles(rects),
+                             [rectangle.normalize_rectangle(rect) for rect in tuples])
+
+    for name, loop, vectorized in [
+            ('area', lambda: [rectangle.rectangle_area(rect) for rect in tuples],
+             lambda: rectangle.rectangle_areas(rects)),
+            ('normalize', lambda: [rectangle.normalize_rectangle(rect) for rect in tuples],
+             lambda: rectangle.normalize_rectangles(rects))]:
+        slow = timer.best_of(3, loop)
+        fast = timer.best_of(3, vectorized)
+        print('%s, %d rectangles: loop %.3fs, array %.4fs, %.0fx faster'
+              % (name, n_rects, slow, fast, slow / fast))
+
+
+if __name__ == '__main__':
+    main()
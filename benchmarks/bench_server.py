@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Compare the per-request latency of readings_client.py, talking to a
+running readings_server.py, with cold runs of readings_09.py.
+Usage: python bench_server.py [n_requests]
+Each request computes --mean for inflammation-01.csv. The client is timed
+both as a new process per request, as a scheduler would run it, and as
+a request sent from this process, which leaves out Python's own startup.
+"""
+
+from pathlib import Path
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+CODE_DIR = ROOT / 'episodes' / 'files' / 'code'
+DATA = str(ROOT / 'episodes' / 'data' / 'inflammation-01.csv')
+sys.path.insert(0, str(CODE_DIR))
+import readings_client
+import timer
+
+
+def main():
+    n_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'readings.sock')
+        env = dict(os.environ, INFLAMMATION_SOCKET=path)
+        server = subprocess.Popen([sys.executable, str(CODE_DIR / 'readings_server.py'),
+                                   '--socket', path], stderr=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(path):
+                time.sleep(0.05)
+
+            expected = subprocess.run([sys.executable, str(CODE_DIR / 'readings_09.py'), DATA],
+                                      capture_output=True, check=True).stdout
+            response = readings_client.request([DATA], path)
+            assert response['stdout'].encode() == expected
+
+            def run(script):
+                subprocess.run([sys.executable, str(CODE_DIR / script), DATA], env=env,
+                               stdout=subprocess.DEVNULL, check=True)
+
+            results = [
+                ('readings_09.py',
+                 timer.wall_times(n_requests, lambda: run('readings_09.py'))),
+                ('readings_client.py',
+                 timer.wall_times(n_requests, lambda: run('readings_client.py'))),
+                ('request()',
+                 timer.wall_times(n_requests, lambda: readings_client.request([DATA], path))),
+            ]
+        finally:
+            server.terminate()
+            server.wait()
+
+    print('%d requests each' % n_requests)
+    for label, times in results:
+        print('%-20s median %7.2f ms, best %7.2f ms'
+              % (label, statistics.median(times) * 1e3, min(times) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
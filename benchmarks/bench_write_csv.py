@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Compare fast_csv.write_csv with a print() per value.
+Usage: python bench_write_csv.py [n_values]
+Output goes to os.devnull so only formatting and write calls are timed.
+"""
+
+from pathlib import Path
+import contextlib
+import io
+import os
+import sys
+
+import numpy
+
+CODE_DIR = Path(__file__).resolve().parent.parent / 'episodes' / 'files' / 'code'
+sys.path.insert(0, str(CODE_DIR))
+import fast_csv
+import timer
+
+
+def print_each(values):
+    for val in values:
+        print(val)
+
+
+def main():
+    n_values = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    values = numpy.random.default_rng(0).integers(0, 20, (n_values, 40)).mean(axis=1)
+
+    expected = io.StringIO()
+    with contextlib.redirect_stdout(expected):
+        print_each(values)
+    written = io.StringIO()
+    fast_csv.write_csv(values, written)
+    assert written.getvalue() == expected.getvalue()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        slow = timer.best_of(3, lambda: print_each(values))
+        fast = timer.best_of(3, lambda: fast_csv.write_csv(values))
+    print('%d values: print %.3fs, write_csv %.3fs, %.1fx faster'
+          % (n_values, slow, fast, slow / fast))
+
+
+if __name__ == '__main__':
+    main()
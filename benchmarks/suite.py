@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the lesson scripts, with results kept as JSON.
+Usage: python suite.py run [--scales small,medium] [--filter REGEX] [--repeats N]
+       python suite.py compare OLD.json NEW.json [--threshold 1.1]
+
+`run` writes deterministic inflammation data with gen_inflammation.py at
+each scale, times every benchmark on it and saves the timings to
+results/<commit>-<time>.json (git-ignored), along with the commit and
+library versions. `compare` prints the ratio of each timing between two
+result files and exits with status 1 if any got slower than the threshold.
+"""
+
+from pathlib import Path
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import numpy
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+sys.path.insert(0, str(ROOT / 'episodes' / 'files' / 'code'))
+sys.path.insert(0, str(ROOT / 'episodes' / 'fig'))
+os.environ.pop('INFLAMMATION_CACHE', None)  # time parsing, not cache hits
+import check
+import gen_inflammation
+import line_count
+import readings_09
+import timer
+
+# name: (patients per file, Matplotlib subplots in the SVG)
+SCALES = {
+    'small': (60, 4),
+    'medium': (10000, 36),
+    'large': (200000, 144),
+}
+N_DAYS = 40
+SEED = 2024
+
+BENCHMARKS = {}
+
+
+def benchmark(name, setup=None):
+    """
+    register func(data) as a benchmark; setup(data), if given, is called
+    untimed before every run
+    """
+    def register(func):
+        BENCHMARKS[name] = (func, setup)
+        return func
+    return register
+
+
+class Data:
+    """the files each benchmark runs on, for one scale"""
+
+    def __init__(self, directory, scale):
+        n_patients, n_subplots = SCALES[scale]
+        self.directory = directory
+        self.csv = os.path.join(directory, 'inflammation.csv')
+        with open(self.csv, 'w') as f:
+            gen_inflammation.generate(f, numpy.random.default_rng(SEED), n_patients, N_DAYS)
+        self.n_subplots = n_subplots
+        self._svg = None
+
+    @property
+    def svg(self):
+        """the text of a Matplotlib SVG, drawn the first time it is needed"""
+        if self._svg is None:
+            self._svg = draw_svg(self.n_subplots)
+        return self._svg
+
+
+def draw_svg(n_subplots):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot
+    matplotlib.pyplot.rcParams['svg.fonttype'] = 'none'
+    data = numpy.random.default_rng(SEED).integers(0, 20, (60, N_DAYS))
+    fig = matplotlib.pyplot.figure(figsize=(20.0, 20.0))
+    side = int(numpy.ceil(numpy.sqrt(n_subplots)))
+    for i in range(n_subplots):
+        axes = fig.add_subplot(side, side, i + 1)
+        axes.plot(data[i % 60], drawstyle='steps-mid')
+        axes.set_ylabel('day %d' % i)
+    svg = io.StringIO()
+    fig.savefig(svg, format='svg')
+    matplotlib.pyplot.close(fig)
+    return svg.getvalue()
+
+
+def register_process(action, compact):
+    @benchmark('readings_09.process[%s%s]' % (action, ',compact' if compact else ''))
+    def time_process(data):
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            readings_09.process(data.csv, [action], compact=compact)
+
+
+for compact in (False, True):
+    for action in readings_09.ACTIONS:
+        register_process(action, compact)
+
+
+@benchmark('check.row_col_count')
+def time_row_col_count(data):
+    check.row_col_count(data.csv)
+
+
+@benchmark('check.quick_row_col_count')
+def time_quick_row_col_count(data):
+    check.quick_row_col_count(data.csv)
+
+
+@benchmark('line_count.count_file')
+def time_count_file(data):
+    line_count.count_file(data.csv)
+
+
+@benchmark('line_count.count_file[mmap]')
+def time_count_mapped(data):
+    line_count.count_file(data.csv, use_mmap=True)
+
+
+def write_svg(data):
+    # manual_cleanup rewrites the file, so it is restored before each run
+    with open(os.path.join(data.directory, 'figure.svg'), 'w') as f:
+        f.write(data.svg)
+
+
+@benchmark('optimize_svg.manual_cleanup', setup=write_svg)
+def time_manual_cleanup(data):
+    import optimize_svg
+    optimize_svg.manual_cleanup([os.path.join(data.directory, 'figure.svg')])
+
+
+def measure(func, setup, data, repeats):
+    """return the wall times (in seconds) of several runs of a benchmark,
+    after one untimed warm-up run"""
+    times = timer.wall_times(repeats + 1, lambda: func(data),
+                             setup and (lambda: setup(data)))
+    return times[1:]
+
+
+def git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return result.stdout.strip()
+
+
+def run(args):
+    scales = args.scales.split(',')
+    for scale in scales:
+        if scale not in SCALES:
+            sys.exit('Unknown scale %s (choose from %s)' % (scale, ', '.join(SCALES)))
+    pattern = re.compile(args.filter or '')
+
+    results = []
+    for scale in scales:
+        directory = tempfile.mkdtemp()
+        try:
+            data = Data(directory, scale)
+            for name, (func, setup) in BENCHMARKS.items():
+                if not pattern.search(name):
+                    continue
+                times = measure(func, setup, data, args.repeats)
+                results.append({'name': name, 'scale': scale, 'best': min(times),
+                                'median': statistics.median(times), 'times': times})
+                print('%-36s %-7s %10.4fs' % (name, scale, min(times)))
+        finally:
+            shutil.rmtree(directory)
+
+    commit = git_commit()
+    started = datetime.datetime.now()
+    report = {
+        'commit': commit,
+        'date': started.isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'repeats': args.repeats,
+        'results': results,
+    }
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / ('%s-%s.json' % (commit, started.strftime('%Y%m%dT%H%M%S')))
+    Path(output).write_text(json.dumps(report, indent=2) + '\n')
+    print('Saved', output)
+
+
+def compare(args):
+    old, new = [json.loads(Path(name).read_text()) for name in (args.old, args.new)]
+    old_times = {(r['name'], r['scale']): r['best'] for r in old['results']}
+    print('%-36s %-7s %10s %10s %7s' % ('benchmark', 'scale', old['commit'], new['commit'], 'ratio'))
+    regressions = 0
+    for result in new['results']:
+        key = (result['name'], result['scale'])
+        if key not in old_times:
+            continue
+        ratio = result['best'] / old_times[key]
+        flag = ''
+        if ratio > args.threshold:
+            regressions += 1
+            flag = '  slower'
+        print('%-36s %-7s %9.4fs %9.4fs %6.2fx%s'
+              % (key + (old_times[key], result['best'], ratio, flag)))
+    if regressions:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lesson scripts.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Time the benchmarks and save the results.")
+    run_parser.add_argument('--scales', default='small,medium',
+                            help="Comma-separated data sizes, from %s "
+                                 "(default: small,medium)." % ', '.join(SCALES))
+    run_parser.add_argument('--filter', metavar='REGEX',
+                            help="Only run benchmarks whose names match.")
+    run_parser.add_argument('--repeats', type=int, default=5,
+                            help="Timed runs of each benchmark (default: 5).")
+    run_parser.add_argument('--output', metavar='FILE',
+                            help="Where to save the results (default: results/).")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser('compare', help="Compare two result files.")
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=1.1,
+                                help="Ratio of new to old time counted as a "
+                                     "regression (default: 1.1).")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
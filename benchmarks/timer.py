@@ -0,0 +1,25 @@
+"""
+Wall-clock timing shared by the benchmark scripts and suite.py.
+"""
+
+import time
+
+
+def wall_times(repeats, func, setup=None):
+    """
+    return the wall times (in seconds) of several calls of func();
+    setup(), if given, is called untimed before each of them
+    """
+    times = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def best_of(repeats, func):
+    """return the best wall time (in seconds) of several calls"""
+    return min(wall_times(repeats, func))
@@ -1,79 +1,205 @@
 #!/usr/bin/env python3
 """
 Generate figures used in the lesson episodes.
-Usage: ./generate_figures.py
+Usage: ./generate_figures.py [--jobs N] [--force]
+
+Each figure is a task made of an output SVG, the CSV it plots and the
+function that draws it. A task is skipped when the hash of its CSV and
+plotting code matches the last build (recorded in .generate_figures.json),
+and the remaining figures are drawn in parallel worker processes.
 """
 
+from pathlib import Path
+import argparse
+import concurrent.futures
+import hashlib
+import inspect
+import json
+import sys
+
 try:
     import numpy
+    import matplotlib
+    matplotlib.use('Agg')  # render straight to files, no display needed
     import matplotlib.pyplot
 except ImportError:
     print("Failed to load NumPy and/or Matplotlib", file=sys.stderr)
     exit(1)
 
-# Configure Matplotlib to not convert text to outlines
-# All settings: matplotlib.rcParams or matplotlib.pyplot.rcParams
-matplotlib.pyplot.rcParams['svg.fonttype'] = 'none'
+HERE = Path(__file__).resolve().parent
+MANIFEST = HERE / '.generate_figures.json'
+
+# Load data through the lesson code's loader, so the .npy cache applies
+sys.path.insert(0, str(HERE.parent / 'files' / 'code'))
+import daily_stats
+import fast_csv
 
-# Load data
-data = numpy.loadtxt(fname="../data/inflammation-01.csv", delimiter=",")
 
 # Episode 1
 ## Visualizing data
 
-matplotlib.pyplot.imshow(data)
-matplotlib.pyplot.savefig("inflammation-01-imshow.svg")
-matplotlib.pyplot.close()
+def plot_imshow(data, stats, output):
+    matplotlib.pyplot.imshow(data)
+    matplotlib.pyplot.savefig(output)
+    matplotlib.pyplot.close()
 
-matplotlib.pyplot.plot(numpy.mean(data, axis=0))
-matplotlib.pyplot.savefig("inflammation-01-average.svg")
-matplotlib.pyplot.close()
 
-matplotlib.pyplot.plot(numpy.max(data, axis=0))
-matplotlib.pyplot.savefig("inflammation-01-maximum.svg")
-matplotlib.pyplot.close()
+def plot_average(data, stats, output):
+    matplotlib.pyplot.plot(stats['average'])
+    matplotlib.pyplot.savefig(output)
+    matplotlib.pyplot.close()
 
-matplotlib.pyplot.plot(numpy.min(data, axis=0))
-matplotlib.pyplot.savefig("inflammation-01-minimum.svg")
-matplotlib.pyplot.close()
 
-## Grouping plots
-fig = matplotlib.pyplot.figure(figsize=(10.0, 3.0))
+def plot_maximum(data, stats, output):
+    matplotlib.pyplot.plot(stats['max'])
+    matplotlib.pyplot.savefig(output)
+    matplotlib.pyplot.close()
 
-axes1 = fig.add_subplot(1, 3, 1)
-axes2 = fig.add_subplot(1, 3, 2)
-axes3 = fig.add_subplot(1, 3, 3)
 
-axes1.set_ylabel('average')
-axes1.plot(numpy.mean(data, axis=0))
+def plot_minimum(data, stats, output):
+    matplotlib.pyplot.plot(stats['min'])
+    matplotlib.pyplot.savefig(output)
+    matplotlib.pyplot.close()
 
-axes2.set_ylabel('max')
-axes2.plot(numpy.max(data, axis=0))
 
-axes3.set_ylabel('min')
-axes3.plot(numpy.min(data, axis=0))
+## Grouping plots
 
-fig.tight_layout()
-matplotlib.pyplot.savefig("inflammation-01-group-plot.svg")
-matplotlib.pyplot.close(fig)
+def plot_group(data, stats, output):
+    fig = matplotlib.pyplot.figure(figsize=(10.0, 3.0))
 
+    axes1 = fig.add_subplot(1, 3, 1)
+    axes2 = fig.add_subplot(1, 3, 2)
+    axes3 = fig.add_subplot(1, 3, 3)
 
-## Exercise: Drawing Straight Lines
-fig = matplotlib.pyplot.figure(figsize=(10.0, 3.0))
+    axes1.set_ylabel('average')
+    axes1.plot(stats['average'])
 
-axes1 = fig.add_subplot(1, 3, 1)
-axes2 = fig.add_subplot(1, 3, 2)
-axes3 = fig.add_subplot(1, 3, 3)
+    axes2.set_ylabel('max')
+    axes2.plot(stats['max'])
 
-axes1.set_ylabel('average')
-axes1.plot(numpy.mean(data, axis=0), drawstyle='steps-mid')
+    axes3.set_ylabel('min')
+    axes3.plot(stats['min'])
 
-axes2.set_ylabel('max')
-axes2.plot(numpy.max(data, axis=0), drawstyle='steps-mid')
+    fig.tight_layout()
+    matplotlib.pyplot.savefig(output)
+    matplotlib.pyplot.close(fig)
 
-axes3.set_ylabel('min')
-axes3.plot(numpy.min(data, axis=0), drawstyle='steps-mid')
 
-fig.tight_layout()
-matplotlib.pyplot.savefig("inflammation-01-line-styles.svg")
-matplotlib.pyplot.close(fig)
+## Exercise: Drawing Straight Lines
+
+def plot_line_styles(data, stats, output):
+    fig = matplotlib.pyplot.figure(figsize=(10.0, 3.0))
+
+    axes1 = fig.add_subplot(1, 3, 1)
+    axes2 = fig.add_subplot(1, 3, 2)
+    axes3 = fig.add_subplot(1, 3, 3)
+
+    axes1.set_ylabel('average')
+    axes1.plot(stats['average'], drawstyle='steps-mid')
+
+    axes2.set_ylabel('max')
+    axes2.plot(stats['max'], drawstyle='steps-mid')
+
+    axes3.set_ylabel('min')
+    axes3.plot(stats['min'], drawstyle='steps-mid')
+
+    fig.tight_layout()
+    matplotlib.pyplot.savefig(output)
+    matplotlib.pyplot.close(fig)
+
+
+# (output SVG, input CSV relative to this directory, plotting function)
+FIGURES = [
+    ('inflammation-01-imshow.svg', '../data/inflammation-01.csv', plot_imshow),
+    ('inflammation-01-average.svg', '../data/inflammation-01.csv', plot_average),
+    ('inflammation-01-maximum.svg', '../data/inflammation-01.csv', plot_maximum),
+    ('inflammation-01-minimum.svg', '../data/inflammation-01.csv', plot_minimum),
+    ('inflammation-01-group-plot.svg', '../data/inflammation-01.csv', plot_group),
+    ('inflammation-01-line-styles.svg', '../data/inflammation-01.csv', plot_line_styles),
+]
+
+
+def configure():
+    """Configure Matplotlib in each process that draws figures."""
+    # Configure Matplotlib to not convert text to outlines
+    # All settings: matplotlib.rcParams or matplotlib.pyplot.rcParams
+    matplotlib.pyplot.rcParams['svg.fonttype'] = 'none'
+
+
+def task_hash(dataset, plot):
+    """Hash everything a figure depends on: its data, its code and Matplotlib."""
+    digest = hashlib.sha256()
+    digest.update((HERE / dataset).read_bytes())
+    digest.update(inspect.getsource(plot).encode())
+    digest.update(inspect.getsource(configure).encode())
+    digest.update(matplotlib.__version__.encode())
+    return digest.hexdigest()
+
+
+def summarize(dataset):
+    """
+    Load a dataset and the per-day statistics shared by its figures, which
+    daily_stats keeps up to date from only the rows added since last time.
+    """
+    data = numpy.asarray(fast_csv.load_csv(HERE / dataset))
+    daily = daily_stats.daily_statistics(HERE / dataset)
+    stats = {
+        'average': daily['mean'],
+        'max': daily['max'],
+        'min': daily['min'],
+    }
+    return data, stats
+
+
+def render(plot, data, stats, output):
+    plot(data, stats, str(HERE / output))
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate figures used in the lesson episodes.")
+    parser.add_argument('--jobs', metavar='N', type=int, default=None,
+                        help="Number of worker processes (default: one per CPU).")
+    parser.add_argument('--force', action='store_true',
+                        help="Redraw every figure, even if its inputs are unchanged.")
+    args = parser.parse_args()
+
+    try:
+        manifest = json.loads(MANIFEST.read_text())
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+
+    stale = []
+    for output, dataset, plot in FIGURES:
+        digest = task_hash(dataset, plot)
+        if args.force or manifest.get(output) != digest or not (HERE / output).is_file():
+            stale.append((output, dataset, plot, digest))
+        else:
+            print("Up to date:", output)
+
+    summaries = {}
+    for _, dataset, _, _ in stale:
+        if dataset not in summaries:
+            summaries[dataset] = summarize(dataset)
+
+    with concurrent.futures.ProcessPoolExecutor(args.jobs, initializer=configure) as executor:
+        futures = {}
+        for output, dataset, plot, digest in stale:
+            data, stats = summaries[dataset]
+            futures[executor.submit(render, plot, data, stats, output)] = (output, digest)
+        for future in concurrent.futures.as_completed(futures):
+            output, digest = futures[future]
+            try:
+                future.result()
+            except Exception as error:
+                print(f"Failed to generate {output}: {error}", file=sys.stderr)
+                manifest.pop(output, None)
+            else:
+                print("Generated:", output)
+                manifest[output] = digest
+
+    MANIFEST.write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+
+
+if __name__ == '__main__':
+    main()
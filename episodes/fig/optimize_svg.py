@@ -6,10 +6,22 @@ Execute `./optimize_svg.py --help` for more information.
 
 from pathlib import Path
 import argparse
+import concurrent.futures
+import copy
+import functools
+import hashlib
+import inspect
+import json
 import re
+import shutil
 import subprocess
 import sys
+import tempfile
 
+SVGO_BATCH = 100  # files per svgo invocation
+MANIFEST = Path(__file__).resolve().parent / '.optimize_svg.json'
+
+@functools.lru_cache(maxsize=None)
 def detect_optimizers():
     """
     Detect available SVG optimizers.
@@ -17,6 +29,7 @@ def detect_optimizers():
         - svgcleaner
         - svgo
         - scour
+    The result is cached, so the tools are only probed once per run.
     """
     available_optimizers = []
 
@@ -48,7 +61,7 @@ def detect_optimizers():
         if __name__ == '__main__':
             print("Found 'scour' version", scour.__version__)
 
-    return available_optimizers
+    return tuple(available_optimizers)
 
 
 def select_optimizer(choice):
@@ -63,7 +76,7 @@ def select_optimizer(choice):
     """
 
     possible = ['svgcleaner', 'svgo', 'scour']
-    available = detect_optimizers()
+    available = list(detect_optimizers())
     allowed = ["auto", "all"] + available
 
     if choice not in allowed:
@@ -84,27 +97,99 @@ def select_optimizer(choice):
 
 ### Functions
 
-def optimize(optimizer, files):
-    """Optimize (SVG) files using specified optimizer."""
+def optimize(optimizer, files, jobs=1):
+    """
+    Optimize (SVG) files using specified optimizer.
+    Returns the files that could not be optimized.
+    """
 
     if optimizer == 'svgcleaner':
-        optimize_with_svgcleaner(files)
+        return optimize_with_svgcleaner(files, jobs)
 
     if optimizer == 'svgo':
-        optimize_with_svgo(files)
+        return optimize_with_svgo(files, jobs)
 
     if optimizer == 'scour':
-        optimize_with_scour(files)
+        return optimize_with_scour(files)
 
+    return []
 
-def optimize_with_scour(files):
-    from scour import scour
+### Skipping files that are already optimized
+
+def file_hash(file):
+    """SHA-256 of a file's contents."""
+    return hashlib.sha256(Path(file).read_bytes()).hexdigest()
+
+def stage_key(name, function, extra=""):
     """
-    Optimize SVG files using Scour.
+    Identify a processing stage by name and by the source code that
+    implements it (plus any extra settings), so changing a tool's
+    options invalidates its records.
+    """
+    source = (inspect.getsource(function) + extra).encode()
+    return name + ":" + hashlib.sha256(source).hexdigest()[:16]
+
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_manifest(manifest, path):
+    temp_path = Path(str(path) + ".tmp")
+    temp_path.write_text(json.dumps(manifest, indent=1, sort_keys=True) + "\n")
+    temp_path.rename(path)
+
+def run_stage(manifest, key, process, files):
+    """
+    Run process(files) on the files that this stage has not produced.
+    The manifest maps, for each stage, the hash of every input it was
+    given to the hash of what it produced; a file whose hash is one of
+    those outputs is already done and is skipped. process returns the
+    files that failed, which are not recorded.
+    Returns the number of files skipped and the set of failed files.
+    """
+    if manifest is None:
+        return 0, set(process(files))
+    records = manifest.setdefault(key, {})
+    done = set(records.values())
+    todo = []
+    before = {}
+    for file in files:
+        try:
+            digest = file_hash(file)
+        except FileNotFoundError:
+            todo.append(file)  # let the stage report it
+            continue
+        if digest not in done:
+            todo.append(file)
+            before[file] = digest
+    failed = set(process(todo)) if todo else set()
+    for file, digest in before.items():
+        if file not in failed and Path(file).is_file():
+            records[digest] = file_hash(file)
+    return len(files) - len(todo), failed
+
+def record_results(manifest, keys, files):
     """
+    Record each file's final contents as done for every stage it went
+    through, since later stages change what earlier ones produced.
+    """
+    for file in files:
+        if Path(file).is_file():
+            digest = file_hash(file)
+            for key in keys:
+                manifest[key].setdefault(digest, digest)
 
-    # Configure scour
-    options = scour.parse_args()
+
+@functools.lru_cache(maxsize=None)
+def scour_options():
+    """Build Scour's options once per run."""
+    from scour import scour
+
+    # Configure scour (from an empty list, as parse_args would read OUR args)
+    options = scour.parse_args([])
 
     options.digits = 4
     # values lower than 4 for '.digits' led to visilble differences between
@@ -125,7 +210,16 @@ def optimize_with_scour(files):
     options.remove_metadata = True
     options.remove_descriptive_elements = True
     options.quiet = True
+    return options
+
+def optimize_with_scour(files):
+    """
+    Optimize SVG files using Scour.
+    """
+    from scour import scour
 
+    options = copy.copy(scour_options())
+    failed = []
     for file in files:
         options.infilename = file
         options.outfilename = file[:-4] + "-scoured.svg"
@@ -138,16 +232,75 @@ def optimize_with_scour(files):
             # Doing this because we have a list of
             # hard-coded file names
             print(f"File {file} not found")
+            failed.append(file)
         except:
             print("Failed to optimize:", file)
+            failed.append(file)
             if not infile.closed: infile.close()
             if not outfile.closed: outfile.close()
             if Path(options.outfilename).is_file():
                 Path(options.outfilename).unlink()
         else:
             Path(options.outfilename).rename(file)
+    return failed
+
+def optimize_in_memory(files, use_scour=False, rules=None):
+    """
+    Optimize SVG files without intermediate files: each file is read
+    once, passed as a string through Scour (if wanted) and the cleanup
+    rules, and written back once, atomically.
+    Returns the files that could not be optimized.
+    """
+    if use_scour:
+        from scour import scour
+        options = scour_options()
+    if rules is None:
+        rules = CLEANUP_RULES
+
+    failed = []
+    for file in files:
+        try:
+            text = Path(file).read_text()
+            if use_scour:
+                text = scour.scourString(text, options)
+            write_atomically(file, rules.clean(text))
+        except FileNotFoundError:
+            print(f"File {file} not found")
+            failed.append(file)
+        except Exception as error:
+            print(f"Failed to optimize {file}: {error}")
+            failed.append(file)
+    return failed
 
-def optimize_with_svgcleaner(files):
+def write_atomically(file, text):
+    """
+    Replace a file's contents so readers see either the old or new version.
+    The file keeps its permissions (temporary files are created as 0600).
+    """
+    path = Path(file)
+    with tempfile.NamedTemporaryFile("w", dir=path.parent, prefix=path.name,
+                                     suffix=".tmp", delete=False) as f:
+        f.write(text)
+    try:
+        shutil.copymode(path, f.name)
+        Path(f.name).replace(path)
+    except OSError:
+        Path(f.name).unlink()
+        raise
+
+def run_concurrently(function, items, jobs):
+    """
+    Call function on each item, running up to `jobs` at once, and
+    return the results in order.
+    Threads are enough since the work happens in external processes.
+    """
+    if jobs <= 1:
+        return [function(item) for item in items]
+    with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+        # list() waits for every call and re-raises any exception
+        return list(executor.map(function, items))
+
+def optimize_with_svgcleaner(files, jobs=1):
     """
     Optimize SVG files using SVGcleaner.
     Used options:
@@ -157,7 +310,14 @@ def optimize_with_svgcleaner(files):
         - coordinates-precision 1
         - properties-precision 1
         - paths-coordinates-precision 1
+    svgcleaner takes one file per run, so up to `jobs` runs go at once.
+    Returns the files that could not be optimized.
     """
+    succeeded = run_concurrently(svgcleaner_file, files, jobs)
+    return [file for file, ok in zip(files, succeeded) if not ok]
+
+def svgcleaner_file(file):
+    """Optimize one SVG file in place using SVGcleaner; True on success."""
     basic_command = [
             "svgcleaner",
             "--indent", "2",
@@ -167,22 +327,22 @@ def optimize_with_svgcleaner(files):
             "--properties-precision", "1",
             "--paths-coordinates-precision", "1"
             ]
-    for file in files:
-        output_file = file[:-4] + "-svgcleaned.svg"
-        command = basic_command + [file, output_file]
-        process = subprocess.run(command, capture_output=True)
-        if process.returncode:
-            error_stream = process.stderr.decode("ascii")
-            if not re.match(r'Your image is .+? smaller now.', error_stream):
-                print(f"Failed to optimize '{file}' with SVGcleaner:", file=sys.stderr)
-                print(error_stream, file=sys.stderr)
-                if Path(output_file).is_file():
-                    Path(output_file).unlink()
-        else:
+    output_file = file[:-4] + "-svgcleaned.svg"
+    command = basic_command + [file, output_file]
+    process = subprocess.run(command, capture_output=True)
+    if process.returncode:
+        error_stream = process.stderr.decode("ascii")
+        if not re.match(r'Your image is .+? smaller now.', error_stream):
+            print(f"Failed to optimize '{file}' with SVGcleaner:", file=sys.stderr)
+            print(error_stream, file=sys.stderr)
             if Path(output_file).is_file():
-                Path(output_file).rename(file)
+                Path(output_file).unlink()
+            return False
+    if Path(output_file).is_file():
+        Path(output_file).rename(file)
+    return True
 
-def optimize_with_svgo(files):
+def optimize_with_svgo(files, jobs=1):
     """
     Optimize SVG files using SVGO.
     Uses the following options:
@@ -194,6 +354,19 @@ def optimize_with_svgo(files):
             * removeStyleElement
             * removeScriptElement
             * removeOffCanvasPaths
+    SVGO accepts many files per run, so files are passed in batches of
+    SVGO_BATCH, with up to `jobs` batches running at once.
+    Returns the files that could not be optimized.
+    """
+    batches = [files[i:i + SVGO_BATCH] for i in range(0, len(files), SVGO_BATCH)]
+    return [file for failed in run_concurrently(svgo_batch, batches, jobs)
+            for file in failed]
+
+def svgo_batch(files):
+    """
+    Optimize a batch of SVG files in place with one SVGO run. If the run
+    fails, the files are retried one by one so errors name the culprit.
+    Returns the files that could not be optimized.
     """
     basic_command = [
             "svgo",
@@ -202,57 +375,145 @@ def optimize_with_svgo(files):
             "--indent=2",
             "--enable={sortAttrs,removeStyleElement,removeScriptElement,removeOffCanvasPaths}"
             ]
-    for file in files:
-        output_file = file[:-4] + "-svgo.svg"
-        command = basic_command + ["-i", file, "-o", output_file]
-        process = subprocess.run(command, capture_output=True)
-        if process.returncode:
-            print(f"Failed to optimize '{file}' with SVGO", file=sys.stderr)
-            print(process.stderr.decode("ascii"), file=sys.stderr)
+    output_files = [file[:-4] + "-svgo.svg" for file in files]
+    command = basic_command + ["-i"] + list(files) + ["-o"] + output_files
+    process = subprocess.run(command, capture_output=True)
+    if process.returncode:
+        for output_file in output_files:
             if Path(output_file).is_file():
                 Path(output_file).unlink()
-        else:
-            if Path(output_file).is_file():
-                Path(output_file).rename(file)
+        if len(files) == 1:
+            print(f"Failed to optimize '{files[0]}' with SVGO", file=sys.stderr)
+            print(process.stderr.decode("ascii"), file=sys.stderr)
+            return list(files)
+        return [file for single in files for file in svgo_batch([single])]
+    for file, output_file in zip(files, output_files):
+        if Path(output_file).is_file():
+            Path(output_file).rename(file)
+    return []
 
 
-def manual_cleanup(files):
+class CleanupRules:
     """
-    Remove junk settings from SVG files generated with Matplotlib.
-    Currently removes:
-        - font-family="DejaVu Sans"
-        - stroke-width=".8"
-        - transform="rotate(-0 ...)"
+    Text to delete from SVG files, applied in a single regular-expression
+    pass over the whole file.
+    Literals and patterns are merged into one precompiled alternation, and
+    lines left empty by the removals are dropped, as is any DOCTYPE.
+    Every removal takes the blanks in front of it too, so that adjacent
+    removals leave no stray space behind.
+    Rules must not match across lines, so that files can also be cleaned
+    in chunks of whole lines.
+    A pattern can declare the characters its matches may start with, after
+    those blanks (as the inside of a regex character class); if every
+    pattern does, the expression begins with a lookahead on those
+    characters, which lets the scan move past all other positions quickly.
     """
-    text_to_remove = [
+
+    def __init__(self, literals=(), patterns=()):
+        self.literals = []
+        self.patterns = []
+        self._regex = None
+        for text in literals:
+            self.add_literal(text)
+        for pattern in patterns:
+            if isinstance(pattern, str):
+                self.add_pattern(pattern)
+            else:
+                self.add_pattern(*pattern)
+
+    def add_literal(self, text):
+        """Register more text to remove."""
+        self.literals.append(text)
+        self._regex = None
+
+    def add_pattern(self, pattern, first_chars=None):
+        """Register a regular expression whose matches are removed."""
+        self.patterns.append((pattern, first_chars))
+        self._regex = None
+
+    @property
+    def regex(self):
+        """The combined expression, compiled when first needed."""
+        if self._regex is None:
+            removals = [re.escape(text) for text in self.literals]
+            removals += [f"(?:{pattern})" for pattern, _ in self.patterns]
+            removal = rf"[^\S\n]*(?:{'|'.join(removals)})" if removals else "(?!)"
+            expression = (
+                    # the whole DOCTYPE declaration, which may span lines
+                    r"^<!DOCTYPE[^>]*>[^\S\n]*\n"
+                    # lines with nothing left once removals are made
+                    rf"|^(?:{removal})*\n"
+                    # anything to remove within a line
+                    rf"|{removal}")
+            if all(first_chars for _, first_chars in self.patterns):
+                first = r"\s"
+                first += "".join(re.escape(text[0]) for text in self.literals if text)
+                first += "".join(first_chars for _, first_chars in self.patterns)
+                expression = rf"(?=[\n<{first}])(?:{expression})"
+            self._regex = re.compile(expression, re.MULTILINE)
+        return self._regex
+
+    def clean(self, text):
+        """Return text with everything matched by the rules removed."""
+        return self.regex.sub("", text)
+
+    def clean_stream(self, infile, outfile, chunk_size=1 << 22):
+        """Clean text from infile into outfile a chunk of whole lines at a time."""
+        tail = ""
+        while True:
+            chunk = infile.read(chunk_size)
+            if not chunk:
+                break
+            chunk = tail + chunk
+            end = chunk.rfind("\n") + 1
+            tail = chunk[end:]
+            outfile.write(self.clean(chunk[:end]))
+        outfile.write(self.clean(tail))
+
+
+CLEANUP_RULES = CleanupRules(
+        literals=[
             # Matplotlib's default font
             'font-family="DejaVu Sans"',
             # Default stroke width of 1.0 is good enough
-            'stroke-width=".8"'
-            ]
-
-    patterns_to_remove = [
+            'stroke-width=".8"',
+            ],
+        patterns=[
             # useless rotations (by 0 degrees)
-            r'\s*transform="rotate\(-?0 .+?\)"',
-            ]
+            (r'transform="rotate\(-?0 .+?\)"', 't'),
+            ])
+
+STREAM_BYTES = 1 << 26  # files larger than this are cleaned in chunks
 
+
+def manual_cleanup(files, rules=CLEANUP_RULES):
+    """
+    Remove junk settings from SVG files generated with Matplotlib.
+    Currently removes (see CLEANUP_RULES):
+        - <!DOCTYPE ...>
+        - font-family="DejaVu Sans"
+        - stroke-width=".8"
+        - transform="rotate(-0 ...)"
+    Returns the files that could not be cleaned up.
+    """
+    failed = []
     for file in files:
         output_file = file[:-4] + "-cleaned.svg"
         try:
             with open(file, "r") as infile, open(output_file, "w") as outfile:
-                for line in infile:
-                    if line.startswith("<!DOCTYPE"): continue
-                    for txt in text_to_remove: line = line.replace(txt, "")
-                    for pat in patterns_to_remove: line = re.sub(pat, "", line)
-                    if line == '\n': continue
-                    outfile.write(line)
+                if Path(file).stat().st_size > STREAM_BYTES:
+                    rules.clean_stream(infile, outfile)
+                else:
+                    outfile.write(rules.clean(infile.read()))
         except:
             print("Failed to clean up:", file)
+            failed.append(file)
             if Path(output_file).is_file():
                 Path(output_file).unlink()
         else:
             if Path(output_file).is_file():
                 Path(output_file).rename(file)
+    return failed
 
 
 if __name__ == '__main__':
@@ -267,15 +528,64 @@ if __name__ == '__main__':
                         help="An optimizer to use. Options: svgcleaner, svgo, scour, auto, all",
                         choices=['svgcleaner', 'svgo', 'scour', 'auto', 'all'],
                         default='auto')
+    parser.add_argument('-j', '--jobs', metavar="N", type=int, default=1,
+                        help="Number of optimizer processes to run at once.")
+    parser.add_argument('--manifest', metavar="PATH", type=Path, default=MANIFEST,
+                        help="Where to record which files are already optimized "
+                             f"(default: {MANIFEST.name} beside this script).")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Process every file, without reading or updating the manifest.")
+    parser.add_argument('--in-memory', action='store_true',
+                        help="Run Scour and the cleanup on each file in memory, "
+                             "writing it only once at the end.")
     parser.add_argument('files',
                         metavar='svg_file',
                         help="SVG file(s) to optimize.", nargs='+')
     args = parser.parse_args()
-    sys.argv = [''] # scour uses OptParse which processes OUR args! argh!
 
-
-    for opt in select_optimizer(args.o):
+    manifest = None if args.no_cache else load_manifest(args.manifest)
+    stage_functions = {
+        'svgcleaner': svgcleaner_file,
+        'svgo': svgo_batch,
+        'scour': optimize_with_scour,
+    }
+    scour_source = inspect.getsource(scour_options)
+    optimizers = select_optimizer(args.o)
+    # in memory, scour is run together with the cleanup at the end
+    use_scour = args.in_memory and 'scour' in optimizers
+    if use_scour:
+        optimizers.remove('scour')
+
+    keys = []
+    failed = set()
+    for opt in optimizers:
         print("Optimizing using:", opt)
-        optimize(opt, args.files)
+        keys.append(stage_key(opt, stage_functions[opt],
+                              scour_source if opt == 'scour' else ""))
+        skipped, stage_failed = run_stage(manifest, keys[-1],
+                                          functools.partial(optimize, opt, jobs=args.jobs),
+                                          args.files)
+        failed |= stage_failed
+        if skipped:
+            print(f"Skipped {skipped} file(s) already optimized with {opt}")
+
+    if args.in_memory:
+        if use_scour:
+            print("Optimizing using: scour (in memory)")
+        keys.append(stage_key('scour+cleanup' if use_scour else 'cleanup',
+                              optimize_in_memory,
+                              CLEANUP_RULES.regex.pattern + (scour_source if use_scour else "")))
+        skipped, stage_failed = run_stage(manifest, keys[-1],
+                                          functools.partial(optimize_in_memory,
+                                                            use_scour=use_scour),
+                                          args.files)
+        failed |= stage_failed
+        if skipped:
+            print(f"Skipped {skipped} file(s) already optimized in memory")
+    else:
+        keys.append(stage_key('cleanup', manual_cleanup, CLEANUP_RULES.regex.pattern))
+        failed |= run_stage(manifest, keys[-1], manual_cleanup, args.files)[1]
 
-    manual_cleanup(args.files)
+    if manifest is not None:
+        record_results(manifest, keys, [file for file in args.files if file not in failed])
+        save_manifest(manifest, args.manifest)
@@ -1,29 +1,134 @@
+import argparse
+import concurrent.futures
+import io
+import json
+import os
+import re
 import sys
-import numpy
+import discover
+import fast_csv
+import timings
+import zip_data
+
+CHUNK_BYTES = 1 << 20  # bytes read at a time when counting lines
+TAIL_BYTES = 1 << 16  # bytes read from the end of a file to find its last line
+BLANK_LINE_END = re.compile(rb'(?:(?<=\n)|(?<=\n\r))\n')  # newline ending an empty line
 
 
 def main():
-    script = sys.argv[0]
-    filenames = sys.argv[1:]
+    parser = argparse.ArgumentParser(
+        description="Check that CSV files have the same shape as the first one.")
+    parser.add_argument('--strict', action='store_true',
+                        help="Parse every value instead of just counting lines "
+                             "and the commas on the first and last lines.")
+    parser.add_argument('--jobs', metavar='N', type=int, default=1,
+                        help="Check N files at a time in worker threads.")
+    parser.add_argument('--fail-fast', action='store_true',
+                        help="Stop at the first file that does not check "
+                             "and exit with status 1.")
+    parser.add_argument('--json', action='store_true',
+                        help="Print a JSON report instead of text.")
+    parser.add_argument('filenames', metavar='filename', nargs='*',
+                        help="Files inside a zip archive are named ARCHIVE.zip::PATTERN, "
+                             "eg data.zip::inflammation*.csv")
+    discover.add_arguments(parser)
+    timings.add_arguments(parser)
+    args = parser.parse_args()
+    timing_format = timings.configure(args.timings)
+    with timings.profiled(args.profile):
+        failed = run(parser, args)
+    if timing_format:
+        timings.report(timing_format)
+    if failed:
+        sys.exit(1)
+
+
+def run(parser, args):
+    """check the files named by args, returning True if --fail-fast failed"""
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    with timings.stage('discover'):
+        filenames = zip_data.expand(args.filenames) + discover.from_arguments(args)
+    if (args.filenames or args.directory) and not filenames:
+        parser.error("no files match")
+    if args.strict:
+        count = row_col_count
+    else:
+        count = quick_row_col_count
+
     if len(filenames) <= 1:  # nothing to check
         print('Only 1 file specified on input')
+        return False
+
+    shape0 = timed_count(count, filenames[0])
+    shapes = check_shapes(filenames[1:], count, shape0, args.jobs, args.fail_fast)
+    with timings.stage('emit'):
+        emit(args, filenames, shape0, shapes)
+    return args.fail_fast and any(shape not in (None, shape0) for shape in shapes)
+
+
+def emit(args, filenames, shape0, shapes):
+    if args.json:
+        print(json.dumps(report(filenames, shape0, shapes), indent=2))
     else:
-        nrow0, ncol0 = row_col_count(filenames[0])
+        nrow0, ncol0 = shape0
         print('First file %s: %d rows and %d columns' % (
             filenames[0], nrow0, ncol0))
-        for filename in filenames[1:]:
-            nrow, ncol = row_col_count(filename)
+        for filename, shape in zip(filenames[1:], shapes):
+            if shape is None:  # skipped after an earlier failure
+                continue
+            nrow, ncol = shape
             if nrow != nrow0 or ncol != ncol0:
                 print('File %s does not check: %d rows and %d columns'
                       % (filename, nrow, ncol))
             else:
                 print('File %s checks' % filename)
-        return
+
+
+def check_shapes(filenames, count, expected, jobs=1, fail_fast=False):
+    """
+    return count(filename) for each file, computed by a pool of threads;
+    with fail_fast, outstanding files are cancelled as soon as one shape
+    differs from expected, and their entries are left as None
+    """
+    shapes = [None] * len(filenames)
+    with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+        futures = {executor.submit(timed_count, count, filename): i
+                   for i, filename in enumerate(filenames)}
+        for future in concurrent.futures.as_completed(futures):
+            shape = future.result()
+            shapes[futures[future]] = shape
+            if fail_fast and shape != expected:
+                executor.shutdown(wait=False, cancel_futures=True)
+                break
+    return shapes
+
+
+def timed_count(count, filename):
+    with timings.stage('load', filename):
+        return count(filename)
+
+
+def report(filenames, shape0, shapes):
+    """summarize a check as a dictionary suitable for JSON output"""
+    files = []
+    for filename, shape in zip(filenames[1:], shapes):
+        if shape is None:
+            files.append({'file': filename, 'status': 'skipped'})
+        else:
+            files.append({'file': filename, 'rows': shape[0], 'columns': shape[1],
+                          'status': 'checks' if shape == shape0 else 'does not check'})
+    return {
+        'reference': {'file': filenames[0], 'rows': shape0[0], 'columns': shape0[1]},
+        'files': files,
+        'ok': all(entry['status'] == 'checks' for entry in files),
+    }
 
 
 def row_col_count(filename):
     try:
-        nrow, ncol = numpy.loadtxt(filename, delimiter=',').shape
+        # only the shape is needed, so hold the values in as few bytes as possible
+        nrow, ncol = fast_csv.load_csv(filename, compact=True).shape
     except ValueError:
         # This occurs if the file doesn't have same number of rows and columns,
         # or if it has non-numeric content
@@ -31,5 +136,76 @@ def row_col_count(filename):
     return nrow, ncol
 
 
+def quick_row_col_count(filename):
+    """
+    count rows and columns without parsing any values: rows are counted
+    from newlines read in large chunks, and columns from the commas on the
+    first and last lines, which must agree. Empty lines are not rows, as
+    for row_col_count, but other content errors in the middle of the file
+    are only caught by row_col_count. A file whose first line ends in \\r
+    alone is handed to row_col_count.
+    """
+    if zip_data.is_member(filename):
+        return quick_count_buffer(zip_data.read_member(filename))
+    if not os.path.isfile(filename):  # pipes etc. can't be read from the end
+        return row_col_count(filename)
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as f:
+        first_line = f.readline()
+        while first_line in (b'\n', b'\r\n'):  # leading empty lines
+            first_line = f.readline()
+        if b'\r' in first_line.rstrip(b'\r\n'):
+            return row_col_count(filename)
+        ncol = first_line.count(b',') + 1
+
+        f.seek(max(0, size - TAIL_BYTES))
+        tail = f.read()
+        body = tail.rstrip()
+        if size > TAIL_BYTES and b'\n' not in body:
+            # the last line is longer than the tail we read
+            return row_col_count(filename)
+        if not body:  # empty file
+            return (0, 0)
+        last_line = body[body.rfind(b'\n') + 1:]
+        if last_line.count(b',') + 1 != ncol:
+            return (0, 0)
+
+        f.seek(0)
+        nrow = blank = 0
+        previous = b'\n'  # so that an empty first line counts as empty
+        chunk = f.read(CHUNK_BYTES)
+        while chunk:
+            nrow += chunk.count(b'\n')
+            blank += count_blank_lines(previous + chunk, len(previous))
+            previous = chunk[-2:]  # the start of an empty line crossing chunks
+            chunk = f.read(CHUNK_BYTES)
+    # newlines after the last line don't start new rows, but the last line
+    # needs counting even if it doesn't end in a newline
+    nrow -= tail[len(body):].count(b'\n')
+    blank -= count_blank_lines(tail, len(body))  # already left out above
+    return nrow - blank + 1, ncol
+
+
+def quick_count_buffer(buf):
+    """quick_row_col_count for a file already read into memory"""
+    body = buf.rstrip().lstrip(b'\r\n')
+    if not body:
+        return (0, 0)
+    if b'\r' in body.replace(b'\r\n', b''):
+        return row_col_count(io.BytesIO(buf))
+    ncol = body.split(b'\n', 1)[0].count(b',') + 1
+    last_line = body[body.rfind(b'\n') + 1:]
+    if last_line.count(b',') + 1 != ncol:
+        return (0, 0)
+    return body.count(b'\n') - count_blank_lines(body) + 1, ncol
+
+
+def count_blank_lines(buf, start=0):
+    """count the empty lines (or lines holding just a \\r) ending in buf[start:]"""
+    if b'\n\n' not in buf and b'\n\r\n' not in buf:
+        return 0
+    return len(BLANK_LINE_END.findall(buf, start))
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,157 @@
+"""
+Per-day statistics of inflammation files that grow by appended rows.
+
+The statistics visualize() plots (the mean, maximum and minimum of each
+day, over all patients) are built from partial results that can be
+merged: the number of rows, and each day's sum, sum of squares, minimum
+and maximum. These are saved in __npycache__/ next to each CSV (see
+data_cache.py) together with the number of bytes of the file they cover,
+so the next call only reads and parses the rows appended since.
+
+A file that has shrunk, or whose last CHECK_BYTES before that offset
+have changed (compared through a hash), is read again from the start;
+other edits to the old rows are not noticed, as they are not expected.
+A final line without a newline, which may still be being written, is
+included in the results but not in the saved state.
+
+Usage: python daily_stats.py [--std] FILE...
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import numpy
+import data_cache
+import fast_csv
+
+CHECK_BYTES = 4096  # bytes before the offset whose hash must still match
+BLOCK_BYTES = 1 << 24  # bytes of new rows read and merged at a time
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print the mean, maximum and minimum of each day (column).")
+    parser.add_argument('--std', action='store_true',
+                        help="Print the standard deviation of each day as well.")
+    parser.add_argument('filenames', metavar='filename', nargs='+')
+    args = parser.parse_args()
+    for filename in args.filenames:
+        stats = daily_statistics(filename)
+        names = ['mean', 'max', 'min'] + (['std'] if args.std else [])
+        print(filename)
+        fast_csv.write_csv(numpy.stack([stats[name] for name in names]))
+
+
+def daily_statistics(filename):
+    """
+    return {'mean', 'max', 'min', 'std', 'count'} for the columns of a
+    file, reading only the rows added since the last call
+    """
+    state = update(filename)
+    count = state['count']
+    mean = state['sum'] / count
+    # clip the rounding error that can make a zero variance negative
+    variance = numpy.maximum(state['sum_squares'] / count - mean ** 2, 0)
+    return {'mean': mean, 'max': state['max'], 'min': state['min'],
+            'std': numpy.sqrt(variance), 'count': count}
+
+
+def update(filename):
+    """fold the rows appended to filename into its saved state, and return it"""
+    path = state_location(filename)
+    state = load_state(path)
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as f:
+        if state is not None and not unchanged(f, state, size):
+            state = None
+        if state is None:
+            state = {'offset': 0, 'check': b''}
+        start = state['offset']
+        f.seek(start)
+        tail = b''
+        while True:
+            chunk = f.read(BLOCK_BYTES)
+            if not chunk:
+                break
+            chunk = tail + chunk
+            end = chunk.rfind(b'\n') + 1
+            tail = chunk[end:]
+            if chunk[:end].strip():
+                state = merge(state, fast_csv.parse_csv(chunk[:end], ndmin=2))
+            state['offset'] += end
+
+        if state['offset'] != start:
+            state['check'] = check_hash(f, state['offset'])
+            save_state(path, state)
+    if tail.strip():  # an unfinished last line: count it, but don't save it
+        state = merge(state, fast_csv.parse_csv(tail, ndmin=2))
+    if 'count' not in state:
+        raise ValueError('%s has no rows' % filename)
+    return state
+
+
+def merge(state, block):
+    """return state with the rows of a 2-D block added to it"""
+    if 'count' not in state:
+        merged = {'count': 0, 'sum': 0, 'sum_squares': 0,
+                  'min': block.min(axis=0), 'max': block.max(axis=0)}
+    else:
+        if block.shape[1] != len(state['sum']):
+            raise ValueError('Rows with %d days appended to rows with %d'
+                             % (block.shape[1], len(state['sum'])))
+        merged = {'min': numpy.minimum(state['min'], block.min(axis=0)),
+                  'max': numpy.maximum(state['max'], block.max(axis=0))}
+        merged.update((name, state[name]) for name in ('count', 'sum', 'sum_squares'))
+    merged['count'] = merged['count'] + len(block)
+    merged['sum'] = merged['sum'] + block.sum(axis=0)
+    merged['sum_squares'] = merged['sum_squares'] + (block ** 2).sum(axis=0)
+    merged['offset'] = state['offset']
+    merged['check'] = state['check']
+    return merged
+
+
+def unchanged(f, state, size):
+    """are the first state['offset'] bytes of f the ones the state was made from?"""
+    return size >= state['offset'] and check_hash(f, state['offset']) == state['check']
+
+
+def check_hash(f, offset):
+    """hash the CHECK_BYTES of f before offset"""
+    start = max(0, offset - CHECK_BYTES)
+    f.seek(start)
+    return hashlib.sha256(f.read(offset - start)).digest()
+
+
+def state_location(filename):
+    cache_dir, prefix = data_cache.cache_location(filename)
+    return os.path.join(cache_dir, prefix + data_cache.STATS_SUFFIX)
+
+
+def load_state(path):
+    try:
+        with numpy.load(path) as saved:
+            state = {name: saved[name] for name in saved.files}
+    except (OSError, ValueError):
+        return None
+    state['offset'] = int(state['offset'])
+    state['check'] = state['check'].tobytes()
+    if 'count' in state:
+        state['count'] = int(state['count'])
+    return state
+
+
+def save_state(path, state):
+    """write the state atomically, so readers never see half of it"""
+    arrays = dict(state)
+    arrays['check'] = numpy.frombuffer(state['check'], dtype=numpy.uint8)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data_cache.write_atomically(path, lambda f: numpy.savez(f, **arrays))
+    except OSError as error:
+        # a read-only data directory just means starting again next time
+        print('Could not save %s: %s' % (path, error), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
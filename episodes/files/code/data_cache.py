@@ -0,0 +1,211 @@
+"""
+Cache parsed CSV data as memory-mappable .npy files.
+
+The cache for data/inflammation-01.csv lives in data/__npycache__/, and
+each entry is named after the size and modification time of the CSV it
+was made from, so editing the CSV makes the old entry unreachable.
+Arrays built from several files (see load_group) are cached beside the
+first of them, keyed by all of their names, sizes and modification times.
+Entries are evicted, least recently used first, once a cache directory
+grows past a size limit. discover.py keeps its directory listings here
+too, and daily_stats.py the partial statistics of each CSV.
+
+Usage:
+    python data_cache.py clear PATH...
+    python data_cache.py evict [--max-bytes N] DIRECTORY...
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import threading
+import numpy
+
+CACHE_DIR = '__npycache__'
+LISTING = 'listing.json'  # directory listing kept by discover.py
+STATS_SUFFIX = 'stats.npz'  # partial statistics kept by daily_stats.py
+MAX_BYTES = int(os.environ.get('INFLAMMATION_CACHE_MAX_BYTES', 1 << 30))
+
+
+def enabled():
+    """caching is switched on by setting INFLAMMATION_CACHE (to anything but 0)"""
+    return os.environ.get('INFLAMMATION_CACHE', '0') not in ('', '0')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the .npy cache of CSV files.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    clear_parser = commands.add_parser(
+        'clear', help="Remove cached copies of CSV files, or whole directories' caches.")
+    clear_parser.add_argument('paths', metavar='path', nargs='+')
+    evict_parser = commands.add_parser(
+        'evict', help="Shrink cache directories to a size limit.")
+    evict_parser.add_argument('--max-bytes', type=int, default=MAX_BYTES)
+    evict_parser.add_argument('directories', metavar='directory', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'clear':
+        removed = sum(clear(path) for path in args.paths)
+        print('Removed %d cache entries' % removed)
+    else:
+        removed = sum(evict(os.path.join(d, CACHE_DIR), args.max_bytes)
+                      for d in args.directories)
+        print('Evicted %d cache entries' % removed)
+
+
+def load(filename, loader, max_bytes=None):
+    """
+    return the array for filename, from the cache if it is up to date,
+    otherwise by calling loader(filename) and caching the result
+    """
+    cache_dir, prefix = cache_location(filename)
+    stat = os.stat(filename)
+    entry = os.path.join(cache_dir, '%s%d-%d.npy' % (prefix, stat.st_size, stat.st_mtime_ns))
+    return cached(entry, lambda: loader(filename), prefix, max_bytes)
+
+
+def load_group(filenames, loader, max_bytes=None):
+    """
+    return one array made from several files by loader(filenames),
+    cached beside the first file and keyed by every file's path, size
+    and modification time
+    """
+    digest = hashlib.sha256()
+    for filename in filenames:
+        stat = os.stat(filename)
+        digest.update(('%s\0%d\0%d\0' % (os.path.abspath(filename), stat.st_size,
+                                          stat.st_mtime_ns)).encode())
+    cache_dir, _ = cache_location(filenames[0])
+    entry = os.path.join(cache_dir, '__group__.%s.npy' % digest.hexdigest()[:32])
+    return cached(entry, lambda: loader(filenames), None, max_bytes)
+
+
+def cached(entry, compute, stale_prefix=None, max_bytes=None):
+    """
+    memory-map the cache entry if it exists, otherwise compute() the
+    array and store it, first removing out-of-date entries with stale_prefix
+    """
+    cache_dir = os.path.dirname(entry)
+    try:
+        data = numpy.load(entry, mmap_mode='r')
+    except (OSError, ValueError):
+        pass  # missing, unreadable or damaged: make it again
+    else:
+        try:
+            os.utime(entry)  # mark as recently used for eviction
+        except OSError:
+            pass
+        return data
+
+    data = compute()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        if stale_prefix is not None:
+            remove_entries(cache_dir, stale_prefix)  # anything left is out of date
+        write_atomically(entry, lambda f: numpy.save(f, data))
+        evict(cache_dir, MAX_BYTES if max_bytes is None else max_bytes)
+    except OSError as error:
+        # a read-only data directory just means no caching
+        print('Could not cache %s: %s' % (entry, error), file=sys.stderr)
+    return data
+
+
+def write_atomically(path, write, mode='wb'):
+    """
+    call write(f) on a temporary file beside path, then rename it to path
+    so readers never see half a file; unlike tempfile's files, it gets the
+    usual permissions (0666 less the umask) so other users can read it
+    """
+    temp = '%s.%d-%d.tmp' % (path, os.getpid(), threading.get_ident())
+    fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        with open(fd, mode) as f:
+            write(f)
+        os.replace(temp, path)
+    except BaseException:
+        remove(temp)
+        raise
+
+
+def cache_location(filename):
+    """return the cache directory for filename and the prefix of its entries"""
+    directory, name = os.path.split(os.path.abspath(filename))
+    return os.path.join(directory, CACHE_DIR), name + '.'
+
+
+def remove_entries(cache_dir, prefix):
+    """delete the entries in cache_dir whose CSV name is given by prefix"""
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if is_entry(name, prefix) and remove(os.path.join(cache_dir, name)):
+            removed += 1
+    return removed
+
+
+def is_entry(name, prefix=''):
+    """is name a cache entry (<prefix><size>-<mtime>.npy) for prefix?"""
+    if not name.startswith(prefix) or not name.endswith('.npy'):
+        return False
+    if prefix == '':
+        return True
+    return name[len(prefix):-len('.npy')].replace('-', '', 1).isdigit()
+
+
+def remove(path):
+    """delete a file, tolerating another process having got there first"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def clear(path):
+    """remove the cache entries for a CSV file, or the whole cache of a directory"""
+    if os.path.isdir(path):
+        cache_dir = os.path.join(path, CACHE_DIR)
+        if not os.path.isdir(cache_dir):
+            return 0
+        removed = 0
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if is_entry(name):
+                removed += remove(path)
+            elif name.endswith(('.tmp', STATS_SUFFIX)) or name == LISTING:
+                remove(path)  # an interrupted write, an index or statistics
+        os.rmdir(cache_dir)
+        return removed
+    cache_dir, prefix = cache_location(path)
+    if not os.path.isdir(cache_dir):
+        return 0
+    remove(os.path.join(cache_dir, prefix + STATS_SUFFIX))
+    return remove_entries(cache_dir, prefix)
+
+
+def evict(cache_dir, max_bytes):
+    """delete least recently used entries until cache_dir holds at most max_bytes"""
+    if not os.path.isdir(cache_dir):
+        return 0
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if is_entry(entry.name):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        if remove(path):
+            removed += 1
+        total -= size
+    return removed
+
+
+if __name__ == '__main__':
+    main()
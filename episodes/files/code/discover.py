@@ -0,0 +1,156 @@
+"""
+Find data files in large directory trees.
+
+find(directory, pattern) is sorted(glob.glob(os.path.join(directory,
+pattern))) built on os.scandir, so each directory is listed in a single
+system call without a stat() per file. With recursive=True it also looks
+in every subdirectory, listing up to `jobs` directories at a time in
+worker threads, which keeps several requests in flight on a network
+filesystem. As with glob, names starting with '.' only match a pattern
+that starts with '.' too, and hidden directories are not searched.
+
+With use_index=True the names in each directory are kept in
+DIRECTORY/__npycache__/listing.json. A directory is only listed again
+when its modification time changes, which happens whenever a file is
+added to it, removed from it or renamed; otherwise its names come from
+the index and the directory itself is only stat()ed.
+
+Usage: python discover.py [--recursive] [--jobs N] [--index] DIRECTORY [PATTERN]
+"""
+
+import argparse
+import concurrent.futures
+import fnmatch
+import json
+import os
+import sys
+import data_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List the files that match a pattern.")
+    parser.add_argument('--recursive', '-r', action='store_true',
+                        help="Look in subdirectories too.")
+    parser.add_argument('--jobs', metavar='N', type=int, default=8,
+                        help="List N directories at a time (default: 8).")
+    parser.add_argument('--index', action='store_true',
+                        help="Reuse the listing of directories that have not changed.")
+    parser.add_argument('directory')
+    parser.add_argument('pattern', nargs='?', default='*')
+    args = parser.parse_args()
+    for path in find(args.directory, args.pattern, args.recursive, args.jobs, args.index):
+        print(path)
+
+
+def add_arguments(parser, pattern='*.csv'):
+    """add the options of scripts that can look for their own input files"""
+    parser.add_argument('--dir', metavar='DIRECTORY', dest='directory',
+                        help="Process the files in DIRECTORY that match --pattern, "
+                             "after any named on the command line.")
+    parser.add_argument('--pattern', default=pattern,
+                        help="Names to look for with --dir (default: %s)." % pattern)
+    parser.add_argument('--recursive', action='store_true',
+                        help="Look in the subdirectories of --dir too.")
+    parser.add_argument('--index', action='store_true',
+                        help="Reuse the listing of directories that have not changed "
+                             "since the last --index run.")
+
+
+def from_arguments(args):
+    """the files found by the options from add_arguments, or [] without --dir"""
+    if args.directory is None:
+        return []
+    return find(args.directory, args.pattern, args.recursive, use_index=args.index)
+
+
+def find(directory, pattern='*', recursive=False, jobs=8, use_index=False):
+    """
+    return the sorted paths of the files under directory whose names
+    match pattern; paths start with directory, so '' gives names
+    relative to the current directory, as glob.glob(pattern) does
+    """
+    top = directory or '.'
+    index = {}
+    if use_index:
+        index_file = index_location(top)
+        index = load_index(index_file)
+
+    found = []
+    listed = {}
+    pending = ['']  # subdirectories of top still to be listed
+    with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+        while pending:
+            listings = executor.map(lambda sub: list_directory(os.path.join(top, sub),
+                                                               index.get(sub)),
+                                    pending)
+            next_pending = []
+            for sub, listing in zip(pending, listings):
+                listed[sub] = listing
+                found += [os.path.join(directory, sub, name) for name in listing['files']
+                          if matches(name, pattern)]
+                if recursive:
+                    next_pending += [os.path.join(sub, name) for name in listing['dirs']
+                                     if not name.startswith('.')]
+            pending = next_pending
+
+    if use_index and listed != index:
+        if recursive:
+            index = listed
+        else:
+            index.update(listed)
+        save_index(index_file, index)
+    return sorted(found)
+
+
+def matches(name, pattern):
+    """does name match pattern the way glob would match it?"""
+    if name.startswith('.') and not pattern.startswith('.'):
+        return False  # hidden, like macOS's ._inflammation-01.csv
+    return fnmatch.fnmatch(name, pattern)
+
+
+def list_directory(path, cached=None):
+    """
+    return {'mtime_ns': ..., 'files': [...], 'dirs': [...]} for a directory,
+    reusing the cached listing if the directory has not changed since
+    """
+    mtime_ns = os.stat(path).st_mtime_ns
+    if cached is not None and cached['mtime_ns'] == mtime_ns:
+        return cached
+    files = []
+    dirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name != data_cache.CACHE_DIR:
+                    dirs.append(entry.name)
+            elif entry.is_file():
+                files.append(entry.name)
+    return {'mtime_ns': mtime_ns, 'files': files, 'dirs': dirs}
+
+
+def index_location(directory):
+    return os.path.join(directory, data_cache.CACHE_DIR, data_cache.LISTING)
+
+
+def load_index(index_file):
+    """the saved listings, keyed by path relative to the indexed directory"""
+    try:
+        with open(index_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_index(index_file, index):
+    """write the index atomically, so readers never see half of it"""
+    try:
+        os.makedirs(os.path.dirname(index_file), exist_ok=True)
+        data_cache.write_atomically(index_file, lambda f: json.dump(index, f), 'w')
+    except OSError as error:
+        # a read-only data directory just means no index
+        print('Could not save listing index %s: %s' % (index_file, error), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
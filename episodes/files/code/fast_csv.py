@@ -0,0 +1,225 @@
+import io
+import sys
+import numpy
+import data_cache
+import zip_data
+
+DELIMITER = b','
+BLOCK_BYTES = 1 << 20  # bytes read at a time when streaming
+WRITE_ROWS = 65536  # rows formatted into each output buffer
+# unsigned dtypes for compact parsing, and the digits each always holds
+INTEGER_DTYPES = [numpy.uint8, numpy.uint16, numpy.uint32, numpy.uint64]
+INTEGER_DIGITS = [2, 4, 9, 19]
+
+
+def load_csv(source, ndmin=0, compact=False):
+    """
+    load a comma-separated file of non-negative integers as a float array
+
+    source is a filename, a member of a zip archive given as
+    ARCHIVE.zip::MEMBER (see zip_data.py), or a file-like object
+    (eg sys.stdin).
+    The whole input is read into one byte buffer and parsed with
+    array operations; anything that is not plain integer CSV (floats,
+    signs, blank fields, ragged rows) is handed on to numpy.loadtxt.
+    As with numpy.loadtxt, a single row or column comes back as a 1-D
+    array unless ndmin=2 is given.
+
+    With compact=True, integer data comes back in the narrowest unsigned
+    integer dtype that holds it (uint8 for inflammation data, an eighth
+    of the memory), and anything else as float64 (see compact()).
+
+    When INFLAMMATION_CACHE is set, files are parsed once and then
+    memory-mapped from a .npy copy (see data_cache.py).
+    """
+    if (data_cache.enabled() and not hasattr(source, 'read')
+            and not zip_data.is_member(source)):
+        data = set_ndmin(data_cache.load(source, load_table), ndmin)
+        return compact_array(data) if compact else data
+    return parse_csv(read_bytes(source), ndmin, compact)
+
+
+def load_table(filename):
+    """load a file as a 2-D array without consulting the cache"""
+    return parse_csv(read_bytes(filename), ndmin=2)
+
+
+def iter_csv(source, block_bytes=BLOCK_BYTES, compact=False):
+    """
+    yield successive 2-D arrays of whole rows from a file or file-like object
+
+    At most block_bytes (plus one partial row) are held at a time, and a
+    block is parsed as soon as it is available rather than when the
+    input ends, so this suits long-running pipes on stdin.
+    """
+    if zip_data.is_member(source):
+        with zip_data.open_member(source) as f:
+            yield from iter_csv(f, block_bytes, compact)
+        return
+    if not hasattr(source, 'read'):
+        with open(source, 'rb') as f:
+            yield from iter_csv(f, block_bytes, compact)
+        return
+    stream = getattr(source, 'buffer', source)
+    # read1 returns whatever is already buffered instead of waiting for more
+    read = getattr(stream, 'read1', stream.read)
+    tail = b''
+    while True:
+        chunk = read(block_bytes)
+        if not chunk:
+            break
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        chunk = tail + chunk
+        end = chunk.rfind(b'\n') + 1
+        tail = chunk[end:]
+        if chunk[:end].strip():
+            yield parse_csv(chunk[:end], ndmin=2, compact=compact)
+    if tail.strip():
+        yield parse_csv(tail, ndmin=2, compact=compact)
+
+
+def parse_csv(buf, ndmin=0, compact=False):
+    """parse a whole buffer of CSV text, falling back to numpy.loadtxt"""
+    data = parse_integers(buf, compact)
+    if data is None:
+        # as text, so lines may end in \r alone, as when loadtxt opens a file
+        data = numpy.loadtxt(io.TextIOWrapper(io.BytesIO(buf)), delimiter=',', ndmin=ndmin)
+        return compact_array(data) if compact else data
+    return set_ndmin(data, ndmin)
+
+
+def compact_array(data):
+    """
+    return data in the narrowest unsigned integer dtype that holds every
+    value exactly, or unchanged if any value is negative or fractional
+    """
+    if data.size == 0 or data.dtype.kind not in 'uif':
+        return data
+    if data.dtype.kind == 'f':
+        if not ((data >= 0) & (data == numpy.floor(data))).all():
+            return data  # also catches NaN
+        if data.max() > 2 ** 53:  # beyond this floats skip integers
+            return data
+    elif data.min() < 0:
+        return data
+    return data.astype(numpy.min_scalar_type(int(data.max())))
+
+
+def set_ndmin(data, ndmin):
+    """squeeze a 2-D array's single rows/columns the way numpy.loadtxt does"""
+    if data.ndim > ndmin:
+        data = numpy.squeeze(data)
+    if ndmin == 1:
+        data = numpy.atleast_1d(data)
+    return data
+
+
+def read_bytes(source):
+    """read all of a file (given by name) or a file-like object as bytes"""
+    if zip_data.is_member(source):
+        return zip_data.read_member(source)
+    if hasattr(source, 'read'):
+        buf = getattr(source, 'buffer', source).read()
+        if isinstance(buf, str):
+            buf = buf.encode()
+        return buf
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def parse_integers(buf, compact=False):
+    """
+    parse a buffer of comma-separated integers into a 2-D float array,
+    or return None if the buffer is not in that simple format; with
+    compact=True the array has the narrowest unsigned dtype that fits
+    """
+    if b'\r' in buf:
+        buf = buf.replace(b'\r\n', b'\n')
+        if b'\r' in buf:  # a line ended by \r alone
+            return None
+    if not buf.endswith(b'\n'):
+        buf += b'\n'
+    first_newline = buf.index(b'\n')
+    if first_newline == 0:  # empty input or leading blank line
+        return None
+    ncol = buf.count(DELIMITER, 0, first_newline) + 1
+
+    raw = numpy.frombuffer(buf, dtype=numpy.uint8)
+    # subtracting '0' wraps every non-digit byte around to a value >= 10
+    digits = raw - ord('0')
+    separators = numpy.flatnonzero(digits >= 10)
+    if separators.size % ncol:
+        return None
+    kinds = raw[separators].reshape(-1, ncol)
+    if (kinds[:, :-1] != ord(DELIMITER)).any() or (kinds[:, -1] != ord('\n')).any():
+        return None
+
+    # each field ends just before its separator; read the digits right to left
+    lengths = numpy.diff(separators, prepend=-1) - 1
+    width = lengths.max()
+    if lengths.min() == 0 or width > 15:  # blank field, or too big for a float
+        return None
+    if compact:
+        # any number of this many digits fits the accumulator exactly
+        dtype = INTEGER_DTYPES[numpy.searchsorted(INTEGER_DIGITS, width)]
+    else:
+        dtype = numpy.float64
+    values = digits[separators - 1].astype(dtype)
+    for k in range(2, width + 1):
+        longer = numpy.flatnonzero(lengths >= k)
+        values[longer] += digits[separators[longer] - k].astype(dtype) * dtype(10 ** (k - 1))
+
+    values = values.reshape(-1, ncol)
+    if compact:
+        values = values.astype(numpy.min_scalar_type(values.max()), copy=False)
+    return values
+
+
+def write_csv(values, stream=None, fmt='%r'):
+    """
+    write a 1-D or 2-D array as comma-separated text, one row per line
+
+    Whole blocks of rows are formatted with a single %-operation and
+    written with one call. The default format gives the same text as
+    print() does for each value.
+    """
+    if stream is None:
+        stream = sys.stdout
+    values = numpy.asarray(values)
+    if values.ndim == 1:
+        values = values.reshape(-1, 1)
+    integers = (values.dtype.kind in 'ui' and fmt in ('%r', '%d')
+                and (values.size == 0 or values.min() >= 0))
+    row_fmt = ','.join([fmt] * values.shape[1]) + '\n'
+    for start in range(0, len(values), WRITE_ROWS):
+        block = values[start:start + WRITE_ROWS]
+        if integers:
+            stream.write(format_integers(block).decode('ascii'))
+        else:
+            stream.write(row_fmt * len(block) % tuple(block.ravel().tolist()))
+
+
+def format_integers(values):
+    """
+    format a 2-D array of non-negative integers as CSV bytes, building
+    every digit with array arithmetic instead of formatting each value
+    """
+    if values.size == 0:
+        return b'\n' * len(values)
+    largest = values.max()
+    width = len(str(largest))
+    # the narrowest dtype that holds the data makes the arithmetic cheaper
+    values = values.astype(numpy.min_scalar_type(largest), copy=False)
+    # one slot per possible digit plus one for the comma or newline
+    text = numpy.empty(values.shape + (width + 1,), dtype=numpy.uint8)
+    keep = numpy.empty(text.shape, dtype=bool)
+    for k in range(width):
+        power = 10 ** (width - 1 - k)
+        text[..., k] = values // power % 10 + ord('0')
+        keep[..., k] = values >= power  # drop leading zeros
+    keep[..., width - 1] = True  # but always keep the units digit
+    text[..., width] = ord(',')
+    text[:, -1, width] = ord('\n')
+    keep[..., width] = True
+    return text[keep].tobytes()
@@ -2,19 +2,64 @@
 
 """
 Generate pseudo-random patient inflammation data for use in Python lessons.
+
+With no arguments, 60 patients x 40 days are printed to standard output.
+Execute `./gen_inflammation.py --help` for options to make larger,
+reproducible data sets spread over several files.
 """
 
-import random
+import argparse
+import sys
+import numpy
+import fast_csv
+
+BLOCK_ROWS = 65536  # patients generated and written at a time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate pseudo-random inflammation data.")
+    parser.add_argument('--patients', type=int, default=60, help="Rows per file.")
+    parser.add_argument('--days', type=int, default=40, help="Columns per file.")
+    parser.add_argument('--range', dest='n_range', type=int, default=20,
+                        help="Largest value, reached in the middle of the period.")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="Seed for the random number generator, for repeatable output.")
+    parser.add_argument('--files', type=int, default=1, help="Number of files to write.")
+    parser.add_argument('--output', metavar='PATTERN', default=None,
+                        help="Output filename, with a %%d placeholder when writing "
+                             "several files, eg 'inflammation-%%02d.csv'. "
+                             "Defaults to standard output.")
+    args = parser.parse_args()
+
+    if args.files > 1 and (args.output is None or '%' not in args.output):
+        parser.error("--files needs an --output pattern containing a %d placeholder")
+
+    rng = numpy.random.default_rng(args.seed)
+    if args.output is None:
+        generate(sys.stdout, rng, args.patients, args.days, args.n_range)
+        return
+    for i in range(1, args.files + 1):
+        filename = args.output % i if '%' in args.output else args.output
+        with open(filename, 'w') as f:
+            generate(f, rng, args.patients, args.days, args.n_range)
+
+
+def generate(stream, rng, n_patients=60, n_days=40, n_range=20):
+    """
+    write n_patients rows of n_days values to stream; each day's value is
+    drawn uniformly between a quarter of that day's upper limit and the
+    limit itself, which rises to n_range in the middle of the period
+    """
+    middle = n_days / 2
+    days = numpy.arange(n_days)
+    upper = numpy.maximum(n_range - numpy.abs(days - middle), 0).astype(int)
+    lower = upper // 4
 
-n_patients = 60
-n_days = 40
-n_range = 20
+    for start in range(0, n_patients, BLOCK_ROWS):
+        n_rows = min(BLOCK_ROWS, n_patients - start)
+        vals = rng.integers(lower, upper, size=(n_rows, n_days), endpoint=True)
+        fast_csv.write_csv(vals, stream, fmt='%d')
 
-middle = n_days / 2
 
-for p in range(n_patients):
-    vals = []
-    for d in range(n_days):
-        upper = max(n_range - abs(d - middle), 0)
-        vals.append(random.randint(upper//4, upper))
-    print(','.join([str(v) for v in vals]))
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Analyze a whole set of inflammation files at once.
+
+All files are stacked into one (files, patients, days) array, and the
+per-day statistics and the checks made by detect_problems() in the
+functions episode are computed as reductions over that array, giving a
+verdict for every file from a single call.
+
+Usage: python inflammation_cube.py inflammation-*.csv
+"""
+
+import sys
+import numpy
+import data_cache
+import fast_csv
+
+SUSPICIOUS_MAXIMA = 'Suspicious looking maxima!'
+ZERO_MINIMA = 'Minima add up to zero!'
+OK = 'Seems OK!'
+
+
+def main():
+    filenames = sys.argv[1:]
+    assert len(filenames) > 0, 'No files given'
+    for filename, verdict in zip(filenames, detect_problems(load_cube(filenames))):
+        print('%s: %s' % (filename, verdict))
+
+
+def load_cube(filenames):
+    """
+    load files with the same shape into one (files, patients, days) array;
+    when INFLAMMATION_CACHE is set, the array is memory-mapped from a
+    cached copy after the first load
+    """
+    if data_cache.enabled():
+        return data_cache.load_group(filenames, stack_files)
+    return stack_files(filenames)
+
+
+def stack_files(filenames):
+    """read each file into its slice of a new (files, patients, days) array"""
+    first = fast_csv.load_csv(filenames[0], ndmin=2)
+    cube = numpy.empty((len(filenames),) + first.shape, dtype=first.dtype)
+    cube[0] = first
+    for i, filename in enumerate(filenames[1:], 1):
+        data = fast_csv.load_csv(filename, ndmin=2)
+        if data.shape != first.shape:
+            raise ValueError('File %s has %d rows and %d columns, but %s has %d and %d'
+                             % ((filename,) + data.shape + (filenames[0],) + first.shape))
+        cube[i] = data
+    return cube
+
+
+def daily_statistics(cube):
+    """return the per-day mean, max and min of every file, each (files, days)"""
+    return {
+        'mean': numpy.mean(cube, axis=1),
+        'max': numpy.max(cube, axis=1),
+        'min': numpy.min(cube, axis=1),
+    }
+
+
+def detect_problems(cube, stats=None):
+    """
+    return a verdict for each file, using the same tests as the
+    functions episode's detect_problems(): a maximum of 0 on day 0 and
+    of 20 on day 20 is suspicious, as are minima that add up to zero
+    """
+    if stats is None:
+        stats = daily_statistics(cube)
+    daily_max = stats['max']
+    if daily_max.shape[1] > 20:
+        suspicious = (daily_max[:, 0] == 0) & (daily_max[:, 20] == 20)
+    else:
+        suspicious = numpy.zeros(len(cube), dtype=bool)
+    zero_minima = numpy.sum(stats['min'], axis=1) == 0
+    return numpy.where(suspicious, SUSPICIOUS_MAXIMA,
+                       numpy.where(zero_minima, ZERO_MINIMA, OK))
+
+
+if __name__ == '__main__':
+    main()
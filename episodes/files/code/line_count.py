@@ -1,5 +1,9 @@
+import mmap
+import os
 import sys
 
+CHUNK_BYTES = 1 << 20  # bytes read at a time
+
 
 def main():
     """
@@ -20,19 +24,43 @@ def main():
         print('total: %d' % sum_nlines)
 
 
-def count_file(filename):
-    """count the number of lines in a file"""
-    f = open(filename, 'r')
-    nlines = len(f.readlines())
-    f.close()
-    return(nlines)
+def count_file(filename, use_mmap=False):
+    """
+    count the number of lines in a file, reading it in large binary
+    chunks (or through a memory map) so memory use stays constant
+    """
+    with open(filename, 'rb') as f:
+        if use_mmap:
+            return count_mapped(f)
+        return count_file_like(f)
 
 
 def count_file_like(file_like):
     """count the number of lines in a file-like object (eg stdin)"""
+    stream = getattr(file_like, 'buffer', file_like)
     n = 0
-    for line in file_like:
-        n = n+1
+    last = b''
+    chunk = stream.read(CHUNK_BYTES)
+    while chunk:
+        n += chunk.count('\n' if isinstance(chunk, str) else b'\n')
+        last = chunk
+        chunk = stream.read(CHUNK_BYTES)
+    if last and last[-1:] not in ('\n', b'\n'):  # last line has no newline
+        n += 1
+    return n
+
+
+def count_mapped(f):
+    """count the number of lines in an open regular file via mmap"""
+    size = os.fstat(f.fileno()).st_size
+    if size == 0:  # empty files can't be mapped
+        return 0
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        n = 0
+        for start in range(0, size, CHUNK_BYTES):
+            n += m[start:start + CHUNK_BYTES].count(b'\n')
+        if m[size - 1:size] != b'\n':  # last line has no newline
+            n += 1
     return n
 
 
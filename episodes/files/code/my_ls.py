@@ -1,15 +1,22 @@
-import glob
-import sys
+import argparse
+import discover
 
 
 def main():
-    """prints names of all files with sys.argv as suffix"""
-    assert len(sys.argv) >= 2, "Argument list cannot be empty"
-    # NB: behaviour is not as you'd expect if sys.argv[1] is *
-    suffix = sys.argv[1]
-    glob_input = '*.' + suffix  # construct the input
-    glob_output = glob.glob(glob_input)  # call the glob function
-    for item in glob_output:  # print the output
+    """prints names of all files with the given suffix"""
+    parser = argparse.ArgumentParser(description="List the files with a particular suffix.")
+    parser.add_argument('suffix')
+    parser.add_argument('directory', nargs='?', default='',
+                        help="Where to look (default: the current directory).")
+    parser.add_argument('--recursive', '-r', action='store_true',
+                        help="Look in subdirectories too.")
+    parser.add_argument('--index', action='store_true',
+                        help="Reuse the listing of directories that have not changed.")
+    args = parser.parse_args()
+    # NB: behaviour is not as you'd expect if the suffix is *
+    pattern = '*.' + args.suffix  # construct the input
+    for item in discover.find(args.directory, pattern, args.recursive,
+                              use_index=args.index):  # print the output
         print(item)
     return
 
@@ -0,0 +1,133 @@
+"""
+Overlaps between [left, right] ranges, for many ranges at once.
+
+range_overlap is the function developed in episode 10; range_overlap_array
+gives the same answer from an (N, 2) array without a Python loop, and
+RangeIndex answers "which ranges overlap this one?" and "which pairs of
+ranges overlap?" using the ranges sorted by their left ends. As in the
+episode, an overlap must have non-zero width, so ranges that only touch
+at an endpoint do not overlap.
+
+Run this file to check the array versions against range_overlap.
+"""
+
+import numpy
+
+
+def range_overlap(ranges):
+    """Return common overlap among a set of [left, right] ranges."""
+    max_left, min_right = ranges[0]
+    for (left, right) in ranges:
+        max_left = max(max_left, left)
+        min_right = min(min_right, right)
+    if max_left >= min_right:
+        overlap = None
+    else:
+        overlap = (max_left, min_right)
+    return overlap
+
+
+def as_ranges(ranges):
+    """return ranges as an (N, 2) float array, checking that each is valid"""
+    ranges = numpy.asarray(ranges, dtype=float).reshape(-1, 2)
+    assert len(ranges) > 0, 'No ranges given'
+    assert numpy.all(ranges[:, 0] <= ranges[:, 1]), 'Range with left end after right end'
+    return ranges
+
+
+def range_overlap_array(ranges):
+    """Return common overlap among an (N, 2) array of [left, right] ranges."""
+    ranges = as_ranges(ranges)
+    max_left = ranges[:, 0].max()
+    min_right = ranges[:, 1].min()
+    if max_left >= min_right:
+        return None
+    return (float(max_left), float(min_right))
+
+
+class RangeIndex:
+    """
+    an index over a fixed set of ranges: build it once in O(n log n),
+    then query it many times; results are indices into the original ranges
+    """
+
+    def __init__(self, ranges):
+        ranges = as_ranges(ranges)
+        self.order = numpy.argsort(ranges[:, 0], kind='stable')
+        self.lefts = ranges[self.order, 0]
+        self.rights = ranges[self.order, 1]
+
+    def __len__(self):
+        return len(self.order)
+
+    def overlapping(self, left, right):
+        """
+        return the sorted indices of the ranges that overlap [left, right]:
+        a binary search finds the ranges that start before `right`, and
+        only those have their right ends compared with `left` (and with
+        their own left ends, since zero-width ranges overlap nothing)
+        """
+        if left >= right:  # a zero-width range overlaps nothing
+            return numpy.empty(0, dtype=self.order.dtype)
+        stop = numpy.searchsorted(self.lefts, right, side='left')
+        rights = self.rights[:stop]
+        hits = self.order[:stop][(rights > left) & (rights > self.lefts[:stop])]
+        return numpy.sort(hits)
+
+    def pairs(self):
+        """
+        return a (K, 2) array of the index pairs (i, j), i < j, of every two
+        ranges that overlap, in O(n log n + K)
+
+        Sweeping the ranges in order of their left ends, each range overlaps
+        the ranges after it that start before it ends, and those form one
+        contiguous run of the sorted order; the runs are expanded into
+        pairs with array operations rather than a loop.
+        """
+        n = len(self.order)
+        ends = numpy.searchsorted(self.lefts, self.rights, side='left')
+        counts = numpy.maximum(ends - numpy.arange(n) - 1, 0)
+        first = numpy.repeat(numpy.arange(n), counts)
+        run_starts = numpy.cumsum(counts) - counts
+        second = first + 1 + numpy.arange(counts.sum()) - numpy.repeat(run_starts, counts)
+        # a zero-width range can fall inside another's run without
+        # overlapping it (a zero-width range's own run is always empty)
+        keep = self.rights[second] > self.lefts[second]
+        first = self.order[first[keep]]
+        second = self.order[second[keep]]
+        pairs = numpy.stack([numpy.minimum(first, second),
+                             numpy.maximum(first, second)], axis=1)
+        return pairs[numpy.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+
+def test_range_overlap(trials=200, seed=0):
+    """check the array versions against range_overlap on random ranges"""
+    for overlap in (range_overlap, range_overlap_array):
+        assert overlap([ (0.0, 1.0) ]) == (0.0, 1.0)
+        assert overlap([ (2.0, 3.0), (2.0, 4.0) ]) == (2.0, 3.0)
+        assert overlap([ (0.0, 1.0), (0.0, 2.0), (-1.0, 1.0) ]) == (0.0, 1.0)
+        assert overlap([ (0.0, 1.0), (5.0, 6.0) ]) == None
+        assert overlap([ (0.0, 1.0), (1.0, 2.0) ]) == None
+
+    rng = numpy.random.default_rng(seed)
+    for _ in range(trials):
+        n = rng.integers(1, 30)
+        # small integer ends, so that touching and zero-width ranges turn up
+        lefts = rng.integers(0, 20, size=n)
+        ranges = numpy.stack([lefts, lefts + rng.integers(0, 6, size=n)], axis=1).astype(float)
+        pairs_list = [tuple(map(float, r)) for r in ranges]
+        assert range_overlap_array(ranges) == range_overlap(pairs_list)
+
+        index = RangeIndex(ranges)
+        expected = [(i, j) for i in range(n) for j in range(i + 1, n)
+                    if range_overlap([pairs_list[i], pairs_list[j]]) is not None]
+        assert [tuple(pair) for pair in index.pairs().tolist()] == expected
+
+        left, right = sorted(rng.integers(0, 25, size=2).astype(float))
+        expected = [i for i in range(n)
+                    if range_overlap([pairs_list[i], (left, right)]) is not None]
+        assert index.overlapping(left, right).tolist() == expected
+
+
+if __name__ == '__main__':
+    test_range_overlap()
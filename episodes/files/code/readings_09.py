@@ -1,34 +1,166 @@
+import argparse
+import concurrent.futures
+import functools
+import io
+import itertools
 import sys
 import numpy
+import discover
+import fast_csv
+import timings
+import zip_data
+
+# sums are always accumulated in float64, so --mean and --std are the same
+# whether the data was loaded as float64 or in a compact integer dtype
+ACTIONS = {'--min': numpy.min,
+           '--mean': functools.partial(numpy.mean, dtype=numpy.float64),
+           '--max': numpy.max,
+           '--std': functools.partial(numpy.std, dtype=numpy.float64)}
+BLOCK_ROWS = 4096  # rows reduced together, small enough to stay in cache
 
 def main():
-    script = sys.argv[0]
-    action = sys.argv[1]
-    if action not in ['--min', '--mean', '--max']:  # if no action given
-        action = '--mean'  # set a default action, that being mean
-        # start the filenames one place earlier in the argv list
-        filenames = sys.argv[1:]
+    parser = make_parser()
+    args = parser.parse_args()
+    timing_format = timings.configure(args.timings)
+    with timings.profiled(args.profile):
+        failed = run(parser, args)
+    if timing_format:
+        timings.report(timing_format)
+    if failed:
+        sys.exit(1)
+
+def make_parser(parser_class=argparse.ArgumentParser):
+    """the command-line parser, shared with readings_server.py"""
+    parser = parser_class(
+        description="Print statistics for each patient (row) of inflammation data.")
+    for action in ACTIONS:
+        parser.add_argument(action, dest='actions', action='append_const', const=action,
+                            help="Print the %s of each row." % action[2:])
+    parser.add_argument('--format', default='%r',
+                        help="printf-style format for each value, eg '%%.3f' "
+                             "(default: same as print)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Read each input in blocks and print results for each "
+                             "block as soon as it is ready, using bounded memory.")
+    parser.add_argument('--jobs', metavar='N', type=int, default=1,
+                        help="Process files in N worker processes; results are "
+                             "still printed in argument order.")
+    parser.add_argument('--compact', action='store_true',
+                        help="Hold integer data in the narrowest unsigned integer "
+                             "type that fits (usually 1 byte per value instead of 8); "
+                             "the output is unchanged.")
+    parser.add_argument('filenames', metavar='filename', nargs='*',
+                        help="If blank (and no --dir), input is taken from standard input (stdin). "
+                             "Files inside a zip archive are named ARCHIVE.zip::PATTERN, "
+                             "eg data.zip::inflammation*.csv")
+    discover.add_arguments(parser)
+    timings.add_arguments(parser)
+    return parser
+
+def run(parser, args):
+    """process the files named by args, returning the number that failed"""
+    with timings.stage('discover'):
+        filenames = zip_data.expand(args.filenames) + discover.from_arguments(args)
+    if (args.filenames or args.directory) and not filenames:
+        parser.error("no files match")
+
+    actions = args.actions
+    if not actions:  # if no action given
+        actions = ['--mean']  # set a default action, that being mean
+
+    if args.stream:
+        handler = process_stream
     else:
-        filenames = sys.argv[2:]
+        handler = process
 
     if len(filenames) == 0:
-        process(sys.stdin, action)
+        handler(sys.stdin, actions, args.format, args.compact)
+    elif args.jobs > 1:
+        return process_parallel(filenames, actions, args.format, args.jobs, args.compact)
     else:
         for filename in filenames:
-            process(filename, action)
+            handler(filename, actions, args.format, args.compact)
+    return 0
+
+def process(filename, actions, fmt='%r', compact=False):
+    name = getattr(filename, 'name', filename)
+    with timings.stage('load', name):
+        data = fast_csv.load_csv(filename, compact=compact)
+    with timings.stage('compute', name):
+        values = compute(data, actions)
+
+    with timings.stage('emit', name):
+        fast_csv.write_csv(values, fmt=fmt)
+
+def process_stream(filename, actions, fmt='%r', compact=False):
+    name = getattr(filename, 'name', filename)
+    blocks = fast_csv.iter_csv(filename, compact=compact)
+    while True:
+        with timings.stage('load', name):
+            block = next(blocks, None)
+        if block is None:
+            break
+        with timings.stage('compute', name):
+            values = compute(block, actions)
+        with timings.stage('emit', name):
+            fast_csv.write_csv(values, fmt=fmt)
+            sys.stdout.flush()  # let the next program in a pipeline see it now
 
-def process(filename, action):
-    data = numpy.loadtxt(filename, delimiter=',')
+def process_parallel(filenames, actions, fmt, jobs, compact=False):
+    """
+    process files in a pool of worker processes, printing each file's
+    results in argument order; a file that fails is reported on stderr
+    without stopping the others, and the number of failures is returned
+    """
+    failed = 0
+    # hand each worker several files at a time to keep the overhead down
+    chunksize = max(1, len(filenames) // (jobs * 4))
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        results = executor.map(render, filenames, itertools.repeat(actions),
+                               itertools.repeat(fmt), itertools.repeat(compact),
+                               itertools.repeat(timings.recording()),
+                               chunksize=chunksize)
+        for filename, (text, error, records) in zip(filenames, results):
+            timings.merge(records)
+            if error is None:
+                with timings.stage('emit', filename):
+                    sys.stdout.write(text)
+            else:
+                failed += 1
+                print('Failed to process %s: %s' % (filename, error), file=sys.stderr)
+    return failed
 
-    if action == '--min':
-        values = numpy.min(data, axis=1)
-    elif action == '--mean':
-        values = numpy.mean(data, axis=1)
-    elif action == '--max':
-        values = numpy.max(data, axis=1)
+def render(filename, actions, fmt, compact=False, timing=False):
+    """
+    return (output text, None, timings) for one file, or (None, error
+    message, timings); timings are the worker's records if timing is set
+    """
+    if timing:
+        timings.configure('table')
+    output = io.StringIO()
+    try:
+        with timings.stage('load', filename):
+            data = fast_csv.load_csv(filename, compact=compact)
+        with timings.stage('compute', filename):
+            values = compute(data, actions)
+        fast_csv.write_csv(values, output, fmt)
+    except Exception as error:
+        return None, '%s: %s' % (type(error).__name__, error), timings.take()
+    return output.getvalue(), None, timings.take()
 
-    for val in values:
-        print(val)
+def compute(data, actions):
+    """
+    reduce each row of data with every requested action in one pass,
+    returning one column of results per action
+    """
+    values = numpy.empty((len(data), len(actions)))
+    # every statistic is taken on a block of rows while it is still in
+    # cache, so the data is only streamed through memory once
+    for start in range(0, len(data), BLOCK_ROWS):
+        block = data[start:start + BLOCK_ROWS]
+        for column, action in enumerate(actions):
+            values[start:start + BLOCK_ROWS, column] = ACTIONS[action](block, axis=1)
+    return values
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,113 @@
+"""
+A drop-in replacement for readings_09.py that asks a running
+readings_server.py to do the work.
+
+This script imports nothing but the standard library, so it starts in a
+fraction of the time that importing NumPy takes. It takes the same
+arguments as readings_09.py and prints the same output; if no server is
+listening, or the server cannot serve the request (--timings and
+--profile measure this process, and --stream reads its input as it
+arrives), readings_09.py is run here instead. Once standard input has
+been sent to the server it cannot be read again, so a failure after
+that is reported, with exit status 1, rather than run here.
+
+The socket is $INFLAMMATION_SOCKET, or readings.sock in $XDG_RUNTIME_DIR
+or else in a readings-<uid> directory, private to the user, in the
+temporary directory. A socket that belongs to another user, or sits in
+a directory that does, is never used.
+
+Usage: python readings_client.py [readings_09.py arguments]
+"""
+
+import json
+import os
+import socket
+import sys
+import tempfile
+
+ENV = 'INFLAMMATION_SOCKET'
+
+
+def socket_path():
+    directory = (os.environ.get('XDG_RUNTIME_DIR')
+                 or os.path.join(tempfile.gettempdir(), 'readings-%d' % os.getuid()))
+    return os.environ.get(ENV) or os.path.join(directory, 'readings.sock')
+
+
+def check_owner(path):
+    """
+    raise PermissionError unless this user owns path, and its directory
+    belongs to this user or to root (like /tmp), so that no other user
+    can have put it there
+    """
+    uid = os.getuid()
+    if (os.stat(os.path.dirname(os.path.abspath(path))).st_uid not in (uid, 0)
+            or os.lstat(path).st_uid != uid):
+        raise PermissionError('%s, or its directory, belongs to another user' % path)
+
+
+def main():
+    argv = sys.argv[1:]
+    if os.environ.get('INFLAMMATION_TIMINGS', '') not in ('', '0'):
+        run_locally(argv)  # timings are for this process
+    try:
+        response = request(argv)
+    except OSError:  # no server
+        response = None
+    if response is None or response.get('local'):
+        run_locally(argv)
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    sys.exit(response['status'])
+
+
+def request(argv, path=None):
+    """
+    send one command line to the server and return its response,
+    {'stdout': ..., 'stderr': ..., 'status': ...}, or {'local': True}
+    """
+    path = path or socket_path()
+    check_owner(path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(path)
+        stream = conn.makefile('rwb')
+        send(stream, {'argv': argv, 'cwd': os.getcwd()})
+        response = receive(stream)
+        if response.get('stdin'):  # no files named, so the data is on our stdin
+            stdin = sys.stdin.buffer.read().decode()
+            try:
+                send(stream, {'stdin': stdin})
+            except OSError:
+                pass  # the server stopped reading, and its reply should say why
+            try:
+                response = receive(stream)
+            except OSError as error:
+                # stdin is used up, so running locally would see no data
+                response = {'stdout': '', 'status': 1, 'stderr':
+                            'readings_client.py: the server failed while reading '
+                            'standard input: %s\n' % error}
+    return response
+
+
+def send(stream, message):
+    stream.write(json.dumps(message).encode() + b'\n')
+    stream.flush()
+
+
+def receive(stream):
+    line = stream.readline()
+    if not line:
+        raise ConnectionError('server closed the connection')
+    return json.loads(line)
+
+
+def run_locally(argv):
+    """run readings_09.py in this process, and exit"""
+    import readings_09
+    sys.argv = ['readings_09.py'] + argv
+    readings_09.main()
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""
+Serve readings_09.py requests from a long-running process.
+
+Starting Python and importing NumPy takes far longer than computing the
+statistics of a small file, so this server pays for both once, keeps the
+arrays of recently used files in memory, and answers readings_client.py
+over a Unix socket. An asyncio front-end accepts any number of clients
+at once and hands each request to a thread pool.
+
+Each request is one line of JSON, {'argv': [...], 'cwd': ...}, parsed
+with readings_09.py's own parser, and the reply is one line,
+{'stdout': ..., 'stderr': ..., 'status': ...}. When no files are named
+the server first replies {'stdin': true} and the client sends
+{'stdin': ...}, of at most MESSAGE_BYTES. --timings, --profile and
+--stream get {'local': true}, and the client runs readings_09.py itself.
+--jobs is accepted but has no effect, since the output is the same
+without it. As with --jobs, a file that cannot be read is reported on
+stderr and the others are still processed.
+
+The socket's directory is created private to the user if it is missing,
+and a socket left behind by a killed server is replaced only if it
+belongs to the same user (see readings_client.check_owner).
+
+Cached arrays are keyed by the file's path, size and modification time,
+so a changed file is read again.
+
+Usage: python readings_server.py [--socket PATH] [--cache-files N] [--workers N]
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import functools
+import io
+import json
+import os
+import signal
+import stat
+import sys
+import discover
+import fast_csv
+import readings_09
+import readings_client
+import zip_data
+
+CACHE_FILES = 256  # arrays kept in memory, least recently used dropped first
+MESSAGE_BYTES = 1 << 30  # longest request line, which holds any piped-in data
+
+
+class RequestExit(Exception):
+    """raised instead of exiting when a request's arguments end its run"""
+
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+class RequestParser(argparse.ArgumentParser):
+    """an ArgumentParser that collects --help and errors for the client"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('prog', 'readings_09.py')
+        super().__init__(*args, **kwargs)
+        self.stdout = io.StringIO()
+        self.stderr = io.StringIO()
+
+    def _print_message(self, message, file=None):
+        if message:
+            (self.stderr if file is sys.stderr else self.stdout).write(message)
+
+    def exit(self, status=0, message=None):
+        if message:
+            self.stderr.write(message)
+        raise RequestExit(status)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve readings_09.py requests.")
+    parser.add_argument('--socket', default=readings_client.socket_path(),
+                        help="Where to listen (default: %(default)s).")
+    parser.add_argument('--cache-files', metavar='N', type=int, default=CACHE_FILES,
+                        help="Arrays to keep in memory (default: %(default)s).")
+    parser.add_argument('--workers', metavar='N', type=int, default=None,
+                        help="Threads computing results (default: Python's choice).")
+    args = parser.parse_args()
+    try:
+        claim_socket(args.socket)
+    except OSError as error:
+        parser.error('cannot listen on %s: %s' % (args.socket, error))
+
+    global load
+    load = functools.lru_cache(maxsize=args.cache_files)(load.__wrapped__)
+    executor = concurrent.futures.ThreadPoolExecutor(args.workers)
+    try:
+        asyncio.run(serve_forever(args.socket, executor))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    finally:
+        executor.shutdown()
+
+
+def claim_socket(path):
+    """make the socket's directory, and remove our own stale socket at path"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+    try:
+        readings_client.check_owner(path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(os.lstat(path).st_mode):
+        raise FileExistsError('%s exists and is not a socket' % path)
+    os.remove(path)  # left behind by a server that was killed
+
+
+async def serve_forever(path, executor):
+    server = await asyncio.start_unix_server(
+        lambda reader, writer: handle(reader, writer, executor), path, limit=MESSAGE_BYTES)
+    os.chmod(path, stat.S_IRUSR | stat.S_IWUSR)  # only this user may connect
+    # stop cleanly, removing the socket, when killed
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM,
+                                                  asyncio.current_task().cancel)
+    print('Listening on %s' % path, file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        os.remove(path)
+
+
+async def handle(reader, writer, executor):
+    """answer one client's request"""
+    loop = asyncio.get_running_loop()
+    try:
+        request = json.loads(await reader.readline())
+        prepared = await loop.run_in_executor(executor, prepare, request)
+        if isinstance(prepared, dict):  # already answered
+            response = prepared
+        else:
+            stdin = None
+            if not prepared[1]:  # no files, so ask for the client's stdin
+                await send(writer, {'stdin': True})
+                try:
+                    stdin = json.loads(await reader.readline())['stdin']
+                except ValueError:  # too long to buffer, or not JSON
+                    await send(writer, {'stdout': '', 'status': 1, 'stderr':
+                                        'readings_server.py: could not read standard input '
+                                        '(at most %d bytes are accepted)\n' % MESSAGE_BYTES})
+                    return
+            response = await loop.run_in_executor(executor, respond, *prepared, stdin)
+        await send(writer, response)
+    except (ConnectionError, ValueError):
+        pass  # the client went away or sent nonsense
+    finally:
+        writer.close()
+
+
+async def send(writer, message):
+    writer.write(json.dumps(message).encode() + b'\n')
+    await writer.drain()
+
+
+def prepare(request):
+    """
+    parse a request's arguments, and return (args, filenames), or a
+    complete response if parsing alone answers it
+    """
+    parser = readings_09.make_parser(RequestParser)
+    try:
+        args = parser.parse_args(request['argv'])
+        if args.timings or args.profile or args.stream:
+            return {'local': True}
+        cwd = request['cwd']
+        filenames = zip_data.expand([os.path.join(cwd, name) for name in args.filenames])
+        if args.directory is not None:
+            args.directory = os.path.join(cwd, args.directory)
+            filenames += discover.from_arguments(args)
+        if (args.filenames or args.directory) and not filenames:
+            parser.error("no files match")
+    except RequestExit as exit:
+        return {'stdout': parser.stdout.getvalue(), 'stderr': parser.stderr.getvalue(),
+                'status': exit.status}
+    return args, filenames
+
+
+def respond(args, filenames, stdin=None):
+    """compute the output readings_09.py would print for a parsed request"""
+    actions = args.actions or ['--mean']
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    status = 0
+    for filename in filenames or ['<stdin>']:
+        try:
+            if filenames:
+                data = cached_load(filename, args.compact)
+            else:
+                data = fast_csv.load_csv(io.BytesIO(stdin.encode()), compact=args.compact)
+            fast_csv.write_csv(readings_09.compute(data, actions), stdout, args.format)
+        except Exception as error:
+            print('Failed to process %s: %s: %s' % (filename, type(error).__name__, error),
+                  file=stderr)
+            status = 1
+    return {'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(), 'status': status}
+
+
+def cached_load(filename, compact=False):
+    """load a file, from memory if it hasn't changed since it was last loaded"""
+    path = filename.split(zip_data.SEPARATOR, 1)[0]  # zip members: stat the archive
+    stat = os.stat(path)
+    return load(filename, stat.st_size, stat.st_mtime_ns, compact)
+
+
+@functools.lru_cache(maxsize=CACHE_FILES)
+def load(filename, size, mtime_ns, compact):
+    data = fast_csv.load_csv(filename, compact=compact)
+    if hasattr(data, 'flags'):
+        data.flags.writeable = False  # shared between requests
+    return data
+
+
+if __name__ == '__main__':
+    main()
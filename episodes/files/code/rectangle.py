@@ -1,3 +1,68 @@
+import numpy
+
+
 def rectangle_area(coords):
     x0, y0, x1, y1 = coords
-    return (x1 - x0) * (x1 - y0)
+    return (x1 - x0) * (y1 - y0)
+
+
+def normalize_rectangle(rect):
+    """Normalizes a rectangle so that it is at the origin and 1.0 units long on its longest axis.
+    Input should be of the format (x0, y0, x1, y1).
+    (x0, y0) and (x1, y1) define the lower left and upper right corners
+    of the rectangle, respectively."""
+    assert len(rect) == 4, 'Rectangles must contain 4 coordinates'
+    x0, y0, x1, y1 = rect
+    assert x0 < x1, 'Invalid X coordinates'
+    assert y0 < y1, 'Invalid Y coordinates'
+
+    dx = x1 - x0
+    dy = y1 - y0
+    if dx > dy:
+        scaled = dy / dx
+        upper_x, upper_y = 1.0, scaled
+    else:
+        scaled = dx / dy
+        upper_x, upper_y = scaled, 1.0
+
+    assert 0 < upper_x <= 1.0, 'Calculated upper X coordinate invalid'
+    assert 0 < upper_y <= 1.0, 'Calculated upper Y coordinate invalid'
+
+    return (0, 0, upper_x, upper_y)
+
+
+def as_rectangles(rects):
+    """return rects as an (N, 4) float array, checking every rectangle at once"""
+    rects = numpy.asarray(rects, dtype=float)
+    assert rects.ndim == 2 and rects.shape[1] == 4, 'Rectangles must contain 4 coordinates'
+    assert numpy.all(rects[:, 0] < rects[:, 2]), 'Invalid X coordinates'
+    assert numpy.all(rects[:, 1] < rects[:, 3]), 'Invalid Y coordinates'
+    return rects
+
+
+def rectangle_areas(rects):
+    """the area of each rectangle in an (N, 4) array of (x0, y0, x1, y1) rows"""
+    rects = as_rectangles(rects)
+    return (rects[:, 2] - rects[:, 0]) * (rects[:, 3] - rects[:, 1])
+
+
+def normalize_rectangles(rects):
+    """
+    normalize_rectangle for each row of an (N, 4) array, returning an
+    (N, 4) array; an assertion fails if any rectangle is invalid
+    """
+    rects = as_rectangles(rects)
+    dx = rects[:, 2] - rects[:, 0]
+    dy = rects[:, 3] - rects[:, 1]
+    longest = numpy.maximum(dx, dy)
+
+    normalized = numpy.zeros_like(rects)
+    normalized[:, 2] = dx / longest
+    normalized[:, 3] = dy / longest
+
+    upper_x = normalized[:, 2]
+    upper_y = normalized[:, 3]
+    assert numpy.all((0 < upper_x) & (upper_x <= 1.0)), 'Calculated upper X coordinate invalid'
+    assert numpy.all((0 < upper_y) & (upper_y <= 1.0)), 'Calculated upper Y coordinate invalid'
+
+    return normalized
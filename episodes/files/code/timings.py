@@ -0,0 +1,163 @@
+"""
+Record where the readings scripts spend their time.
+
+Scripts wrap each stage of their work (discover, load, compute, emit) in
+`with timings.stage(name, filename):`. Once configure() has switched
+recording on, with a --timings option or by setting INFLAMMATION_TIMINGS
+to 'table' or 'json', every stage adds its wall-clock time, the CPU time
+of its thread and the process's peak resident memory to a running total
+for that file and stage, and report() prints the totals to stderr.
+Otherwise stage() hands back one shared do-nothing context manager, so
+the cost is a function call per stage.
+
+profiled(filename) runs a block under cProfile and saves the statistics,
+to be read with `python -m pstats FILE`.
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+ENV = 'INFLAMMATION_TIMINGS'
+FORMATS = ('table', 'json')
+
+_records = None  # {(filename, stage): [calls, wall, cpu, peak RSS]} while recording
+_lock = threading.Lock()
+_off = contextlib.nullcontext()
+
+
+def add_arguments(parser):
+    """add the --timings, --timings-json and --profile options"""
+    parser.add_argument('--timings', action='store_const', const='table',
+                        help="Print the time and memory used by each stage of each "
+                             "file to stderr as a table (or set %s=table)." % ENV)
+    parser.add_argument('--timings-json', dest='timings', action='store_const',
+                        const='json', help="The same, as JSON (or set %s=json)." % ENV)
+    parser.add_argument('--profile', metavar='FILE',
+                        help="Save cProfile statistics for the whole run to FILE.")
+
+
+def configure(fmt=None):
+    """
+    start recording if fmt, or failing that $INFLAMMATION_TIMINGS, names a
+    report format (any other non-empty value but 0 means 'table');
+    return the format, or None if recording is off
+    """
+    global _records
+    if fmt is None:
+        fmt = os.environ.get(ENV, '')
+        if fmt in ('', '0'):
+            return None
+        if fmt not in FORMATS:
+            fmt = 'table'
+    _records = {}
+    return fmt
+
+
+def recording():
+    return _records is not None
+
+
+def stage(name, filename=''):
+    """a context manager timing one stage of the work on filename"""
+    if _records is None:
+        return _off
+    return _timed(name, str(filename))
+
+
+@contextlib.contextmanager
+def _timed(name, filename):
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        yield
+    finally:
+        add(filename, name, 1, time.perf_counter() - wall,
+            time.thread_time() - cpu, peak_rss())
+
+
+def add(filename, name, calls, wall, cpu, rss):
+    with _lock:
+        record = _records.setdefault((filename, name), [0, 0.0, 0.0, 0])
+        record[0] += calls
+        record[1] += wall
+        record[2] += cpu
+        record[3] = max(record[3], rss)
+
+
+def take():
+    """return the records so far as a list of tuples, and forget them"""
+    if _records is None:
+        return []
+    with _lock:
+        records = [key + tuple(record) for key, record in _records.items()]
+        _records.clear()
+    return records
+
+
+def merge(records):
+    """add records taken in another process (see take) to this one's"""
+    for record in records:
+        add(*record)
+
+
+def peak_rss():
+    """the largest resident set size of this process so far, in bytes"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak  # bytes on macOS, kilobytes elsewhere
+    return peak * 1024
+
+
+def report(fmt, stream=None):
+    """print the records as a table or as JSON, to stderr by default"""
+    stream = stream or sys.stderr
+    records = take()
+    if fmt == 'json':
+        json.dump([{'file': filename, 'stage': name, 'calls': calls, 'wall': wall,
+                    'cpu': cpu, 'peak_rss': rss}
+                   for filename, name, calls, wall, cpu, rss in records],
+                  stream, indent=2)
+        stream.write('\n')
+        return
+    totals = {}
+    print('%-40s %-8s %6s %10s %10s %9s' % ('file', 'stage', 'calls', 'wall (s)',
+                                            'cpu (s)', 'peak MB'), file=stream)
+    for filename, name, calls, wall, cpu, rss in records:
+        print('%-40s %-8s %6d %10.4f %10.4f %9.1f'
+              % (filename[-40:] or '-', name, calls, wall, cpu, rss / 1e6), file=stream)
+        total = totals.setdefault(name, [0, 0.0, 0.0, 0])
+        total[0] += calls
+        total[1] += wall
+        total[2] += cpu
+        total[3] = max(total[3], rss)
+    for name, (calls, wall, cpu, rss) in totals.items():
+        print('%-40s %-8s %6d %10.4f %10.4f %9.1f'
+              % ('total', name, calls, wall, cpu, rss / 1e6), file=stream)
+
+
+@contextlib.contextmanager
+def profiled(filename):
+    """run the block under cProfile and save its statistics to filename
+    (nothing is done if filename is None)"""
+    if filename is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(filename)
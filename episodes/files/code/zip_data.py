@@ -0,0 +1,83 @@
+"""
+Read data files straight out of a zip archive, without extracting them.
+
+A member of an archive is named ARCHIVE.zip::MEMBER, and MEMBER may be a
+glob-like pattern such as 'inflammation*.csv'. A pattern without a '/'
+is matched against the members' base names, the way
+glob.glob('inflammation*.csv') is used inside the data directory;
+otherwise it is matched against their full paths within the archive.
+"""
+
+import fnmatch
+import os
+import posixpath
+import threading
+import zipfile
+
+SEPARATOR = '::'
+OPEN_ARCHIVES = 8  # ZipFiles each thread keeps open, least recently used closed first
+
+_open_archives = threading.local()  # {archive: ((inode, size, mtime), ZipFile)} per thread
+
+
+def is_member(path):
+    """is path of the form ARCHIVE.zip::MEMBER?"""
+    return isinstance(path, str) and SEPARATOR in path
+
+
+def expand(paths):
+    """
+    return paths with every ARCHIVE.zip::PATTERN replaced by the sorted
+    list of matching members; other paths are passed through unchanged
+    """
+    expanded = []
+    for path in paths:
+        if is_member(path):
+            archive, pattern = path.split(SEPARATOR, 1)
+            expanded += [archive + SEPARATOR + name for name in match(archive, pattern)]
+        else:
+            expanded.append(path)
+    return expanded
+
+
+def match(archive, pattern):
+    """return the sorted names of the files in archive that match pattern"""
+    names = [info.filename for info in open_archive(archive).infolist() if not info.is_dir()]
+    if '/' in pattern:
+        return sorted(name for name in names if fnmatch.fnmatchcase(name, pattern))
+    return sorted(name for name in names
+                  if fnmatch.fnmatchcase(posixpath.basename(name), pattern))
+
+
+def read_member(path):
+    """return the decompressed bytes of ARCHIVE.zip::MEMBER"""
+    archive, name = path.split(SEPARATOR, 1)
+    return open_archive(archive).read(name)
+
+
+def open_member(path):
+    """open ARCHIVE.zip::MEMBER for reading, decompressing as it is read"""
+    archive, name = path.split(SEPARATOR, 1)
+    return open_archive(archive).open(name)
+
+
+def open_archive(archive):
+    """
+    return this thread's open ZipFile for archive, opening it again if the
+    file has been replaced or changed since
+    """
+    archives = getattr(_open_archives, 'archives', None)
+    if archives is None:
+        archives = _open_archives.archives = {}
+    stat = os.stat(archive)
+    version = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    opened = archives.pop(archive, None)  # re-added below as the most recent
+    if opened is not None and opened[0] != version:
+        opened[1].close()
+        opened = None
+    if opened is None:
+        opened = (version, zipfile.ZipFile(archive))
+    archives[archive] = opened
+    while len(archives) > OPEN_ARCHIVES:
+        archives.pop(next(iter(archives)))[1].close()
+    return opened[1]